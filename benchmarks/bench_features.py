@@ -0,0 +1,66 @@
+import argparse
+import time
+import pandas as pd
+from src.ml.features import load_training_data, calculate_rolling_features, ROLLING_SPECS
+
+def lambda_rolling_features(data):
+    # The previous implementation: a Python lambda per group, per feature
+    data['team_avg_runs_5'] = data.groupby('team')['runs'].transform(lambda x: x.shift(1).rolling(window=5, min_periods=1).mean())
+    data['team_avg_runs_all'] = data.groupby('team')['runs'].transform(lambda x: x.shift(1).expanding().mean())
+    data['venue_avg_runs'] = data.groupby('venue')['runs'].transform(lambda x: x.shift(1).expanding().mean())
+    data.fillna(data['runs'].mean(), inplace=True)
+    return data
+
+def scale(data, factor, new_groups=False):
+    # Repeat the history `factor` times as later eras: same teams and venues,
+    # factor x more innings per group. With new_groups each era gets its own
+    # team/venue names instead, the shape of player-level features (many small groups).
+    span = data['match_date'].max() - data['match_date'].min() + pd.Timedelta(days=1)
+    id_step = int(data['match_id'].max()) + 1
+    copies = []
+    for i in range(factor):
+        copy = data.copy()
+        copy['match_date'] = copy['match_date'] + span * i
+        copy['match_id'] = copy['match_id'] + id_step * i
+        if new_groups:
+            copy['team'] = copy['team'] + f"#{i}"
+            copy['venue'] = copy['venue'] + f"#{i}"
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True).sort_values(['match_date', 'match_id'], kind='stable')
+
+def timed(fn, data, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        frame = data.copy()
+        start = time.perf_counter()
+        result = fn(frame)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def run(factors=(1, 10, 100), new_groups=False):
+    base = load_training_data()
+    cols = [spec.name for spec in ROLLING_SPECS]
+    results = []
+    for factor in factors:
+        data = scale(base, factor, new_groups)
+        old_s, old = timed(lambda_rolling_features, data)
+        new_s, new = timed(calculate_rolling_features, data)
+        results.append({
+            'factor': factor,
+            'rows': len(data),
+            'groups': int(data['team'].nunique() + data['venue'].nunique()),
+            'lambda_ms': round(old_s * 1000, 2),
+            'vectorized_ms': round(new_s * 1000, 2),
+            'speedup': round(old_s / new_s, 1),
+            'identical': bool((old[cols] == new[cols]).all().all()),
+        })
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rolling feature computation at scaled row counts")
+    parser.add_argument("--factors", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--new-groups", action="store_true", help="Scale the number of teams/venues too")
+    args = parser.parse_args()
+    for r in run(args.factors, args.new_groups):
+        print(f"{r['factor']:>4}x {r['rows']:>8} rows {r['groups']:>6} groups: lambda {r['lambda_ms']} ms, "
+              f"vectorized {r['vectorized_ms']} ms ({r['speedup']}x), identical={r['identical']}")
@@ -0,0 +1,62 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from src.ml.features import FEATURES
+from src.ml.predict import Predictor
+
+SCENARIO = dict(season=2024, venue="Wankhede Stadium", team="MI", opposition="CSK",
+                toss_winner="MI", toss_choice="bat", innings=1)
+
+def frame_predict(predictor, season, venue, team, opposition, toss_winner, toss_choice, innings):
+    # The previous per-call path: one-row DataFrame converted to a DMatrix
+    input_data = pd.DataFrame([{
+        'season': season,
+        'venue': predictor._encode('venue', venue),
+        'team': predictor._encode('team', team),
+        'opposition': predictor._encode('opposition', opposition),
+        'toss_winner': predictor._encode('toss_winner', toss_winner),
+        'toss_choice': predictor._encode('toss_choice', toss_choice),
+        'innings': innings,
+        **predictor.rolling_features(team, venue),
+    }])
+    return float(predictor.current.booster.predict(xgb.DMatrix(input_data[FEATURES]))[0])
+
+def measure(fn, iterations, warmup=50):
+    for _ in range(warmup):
+        fn()
+    timings = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter_ns()
+        fn()
+        timings[i] = time.perf_counter_ns() - start
+    return {
+        'p50_us': round(float(np.percentile(timings, 50)) / 1000, 1),
+        'p99_us': round(float(np.percentile(timings, 99)) / 1000, 1),
+        'mean_us': round(float(timings.mean()) / 1000, 1),
+    }
+
+def run(iterations=2000):
+    start = time.perf_counter()
+    predictor = Predictor()
+    predictor.load_model()
+    load_ms = (time.perf_counter() - start) * 1000
+
+    results = {
+        'model_load_ms': round(load_ms, 1),
+        'dataframe_path': measure(lambda: frame_predict(predictor, **SCENARIO), iterations),
+        'fast_path': measure(lambda: predictor.predict(**SCENARIO), iterations),
+    }
+    assert abs(frame_predict(predictor, **SCENARIO) - predictor.predict(**SCENARIO)) < 1e-3
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-call latency of Predictor.predict")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    results = run(args.iterations)
+    print(f"Model load: {results['model_load_ms']} ms")
+    for name in ['dataframe_path', 'fast_path']:
+        r = results[name]
+        print(f"{name:>15}: p50 {r['p50_us']} us, p99 {r['p99_us']} us, mean {r['mean_us']} us")
@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from contextlib import asynccontextmanager
+import httpx
+import numpy as np
+
+PREDICT_BODY = dict(season=2024, venue="Wankhede Stadium", team="MI", opposition="CSK",
+                    toss_winner="MI", toss_choice="bat", innings=1)
+
+def scenario(player_ids, seed=0):
+    # Weighted mix of the dashboard's calls; ids vary so both cached and
+    # uncached responses are exercised
+    rng = random.Random(seed)
+    mix = [
+        (3, lambda: ('players', 'GET', f"/api/players?limit=20&offset={rng.randrange(0, 500)}", None)),
+        (3, lambda: ('player_stats', 'GET', f"/api/players/{rng.choice(player_ids)}/stats", None)),
+        (2, lambda: ('player_bowling', 'GET', f"/api/players/{rng.choice(player_ids)}/bowling", None)),
+        (2, lambda: ('search', 'GET', f"/api/players/search?q={rng.choice('abcdefghijklmnoprstv')}", None)),
+        (1, lambda: ('leaderboard', 'GET', f"/api/leaderboards/runs?season={rng.randrange(2008, 2024)}", None)),
+        (2, lambda: ('predict', 'POST', "/api/predict", PREDICT_BODY)),
+    ]
+    weights = [w for w, _ in mix]
+    while True:
+        yield rng.choices(mix, weights)[0][1]()
+
+def _percentiles(latencies):
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]) if len(values) else (0, 0, 0)
+    return {'p50_ms': round(float(p50), 2), 'p95_ms': round(float(p95), 2), 'p99_ms': round(float(p99), 2)}
+
+def summarize(records, elapsed):
+    # records: (name, seconds, status)
+    summary = {'requests': len(records), 'errors': sum(1 for r in records if r[2] >= 400),
+               'seconds': round(elapsed, 2), 'requests_per_sec': round(len(records) / elapsed, 1) if elapsed else 0.0,
+               **_percentiles([r[1] for r in records]), 'endpoints': {}}
+    for name in sorted({r[0] for r in records}):
+        latencies = [r[1] for r in records if r[0] == name]
+        summary['endpoints'][name] = {'requests': len(latencies), **_percentiles(latencies)}
+    return summary
+
+@asynccontextmanager
+async def _client(url=None, app=None):
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+            yield client
+        return
+    # In process: the app's lifespan runs as it would under uvicorn
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+            yield client
+
+async def _worker(client, requests, records, deadline, remaining):
+    while time.perf_counter() < deadline:
+        if remaining is not None:
+            if remaining[0] <= 0:
+                return
+            remaining[0] -= 1
+        name, method, path, body = next(requests)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body)
+            status = response.status_code
+        except httpx.HTTPError:
+            status = 599
+        records.append((name, time.perf_counter() - start, status))
+
+async def _run(url, app, concurrency, duration, total, warmup, seed):
+    async with _client(url, app) as client:
+        players = (await client.get("/api/players?limit=200")).json()
+        requests = scenario([p['player_id'] for p in players] or [0], seed)
+        for _ in range(warmup):
+            name, method, path, body = next(requests)
+            await client.request(method, path, json=body)
+        records = []
+        # Fixed concurrency: each worker sends its next request as soon as the last one returns
+        remaining = None if total is None else [total]
+        deadline = time.perf_counter() + (duration if duration else float('inf'))
+        start = time.perf_counter()
+        await asyncio.gather(*[_worker(client, requests, records, deadline, remaining) for _ in range(concurrency)])
+        return summarize(records, time.perf_counter() - start)
+
+def run(url=None, concurrency=8, duration=None, requests=2000, warmup=50, seed=0):
+    # Against a running server when `url` is given, otherwise the app in this process
+    app = None
+    if not url:
+        from src.api.main import app
+    if duration:
+        requests = None
+    return asyncio.run(_run(url, app, concurrency, duration, requests, warmup, seed))
+
+def report(summary):
+    print(f"{summary['requests']} requests in {summary['seconds']}s ({summary['requests_per_sec']} req/s), "
+          f"{summary['errors']} errors: p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, p99 {summary['p99_ms']} ms")
+    for name, r in summary['endpoints'].items():
+        print(f"{name:>15}: {r['requests']:>6} requests, p50 {r['p50_ms']} ms, p95 {r['p95_ms']} ms, p99 {r['p99_ms']} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive the API at a fixed concurrency and report latency percentiles")
+    parser.add_argument("--url", default=None, help="Base URL of a running server (default: the app in-process)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=None, help="Run for this many seconds instead")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Also write the summary to this JSON file")
+    args = parser.parse_args()
+    summary = run(args.url, args.concurrency, args.duration, args.requests, args.warmup, args.seed)
+    report(summary)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
@@ -0,0 +1,189 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from benchmarks import load_test
+from benchmarks.bench_predict import SCENARIO, measure
+from benchmarks.synthetic import scale_raw
+from src.etl.ingest import RAW_PATH, load_data
+from src.etl.schema import get_engine
+from src.ml.features import load_training_data, calculate_rolling_features
+from src.ml.predict import Predictor
+from src.ml.train import train_model
+
+BASELINE_PATH = "benchmarks/baseline.json"
+RESULTS_DIR = "benchmarks/results"
+WORK_DIR = "data/synthetic"
+DEFAULT_FACTORS = [1, 10]
+# A metric this much worse than the baseline counts as a regression...
+TOLERANCE = 0.25
+# ...as long as it also moved by more than timer noise, by unit
+NOISE_FLOOR = {'seconds': 0.01, '_ms': 2.0, '_us': 50.0, 'per_sec': 0.0}
+
+@contextlib.contextmanager
+def _quiet(verbose):
+    if verbose:
+        yield
+        return
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def bench_load_data(raw_path, url):
+    start = time.perf_counter()
+    stats = load_data(raw_path, engine=get_engine(url))
+    seconds = time.perf_counter() - start
+    rows = sum(s['rows'] for s in stats.values())
+    return {'rows': rows, 'seconds': round(seconds, 3), 'rows_per_sec': round(rows / seconds, 1)}
+
+def bench_features(url, repeat=3):
+    data = load_training_data(get_engine(url))
+    best = float('inf')
+    for _ in range(repeat):
+        frame = data.copy()
+        start = time.perf_counter()
+        calculate_rolling_features(frame)
+        best = min(best, time.perf_counter() - start)
+    return {'rows': len(data), 'seconds': round(best, 4)}
+
+def bench_train(registry_path):
+    start = time.perf_counter()
+    train_model(registry_path=registry_path)
+    return {'seconds': round(time.perf_counter() - start, 3)}
+
+def bench_predict(registry_path, iterations):
+    start = time.perf_counter()
+    predictor = Predictor(registry_path)
+    predictor.load_model()
+    load_ms = (time.perf_counter() - start) * 1000
+    return {'model_load_ms': round(load_ms, 1), **measure(lambda: predictor.predict(**SCENARIO), iterations)}
+
+def run_factor(factor, work_dir, iterations, verbose=False):
+    # Serving and training read the database from IPL_DATABASE_URL, so each
+    # factor gets its own file and the variable points at it while it runs
+    raw_path = os.path.join(work_dir, f"x{factor}")
+    if factor == 1:
+        raw_path = RAW_PATH
+    elif not os.path.exists(os.path.join(raw_path, "ipl_historical.csv")):
+        scale_raw(factor, raw_path)
+    db_path = os.path.join(work_dir, f"x{factor}.db")
+    for suffix in ['', '-wal', '-shm']:
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    url = f"sqlite:///{db_path}"
+    os.environ['IPL_DATABASE_URL'] = url
+
+    results = {}
+    with _quiet(verbose), tempfile.TemporaryDirectory() as registry_path:
+        results['load_data'] = bench_load_data(raw_path, url)
+        results['features'] = bench_features(url)
+        results['train'] = bench_train(registry_path)
+        results['predict'] = bench_predict(registry_path, iterations)
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+def environment():
+    import numpy
+    import pandas
+    import xgboost
+    return {'timestamp': datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(),
+            'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'numpy': numpy.__version__, 'pandas': pandas.__version__, 'xgboost': xgboost.__version__}
+
+def run_suite(factors=DEFAULT_FACTORS, work_dir=WORK_DIR, iterations=2000, requests=2000, concurrency=8,
+              api=True, verbose=False):
+    os.makedirs(work_dir, exist_ok=True)
+    results = {}
+    for factor in factors:
+        print(f"Running {factor}x...")
+        results[f"x{factor}"] = run_factor(factor, work_dir, iterations, verbose)
+    if api:
+        # Last: importing the app installs the SQL timing hooks, which would
+        # otherwise be measured by the benchmarks above. Served from the
+        # last factor's database.
+        print(f"Load testing the API on the {factors[-1]}x database...")
+        with _quiet(verbose):
+            results['api'] = load_test.run(concurrency=concurrency, requests=requests)
+    return {'environment': environment(), 'factors': list(factors), 'results': results}
+
+def _flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+def direction(metric):
+    # 1 when higher is better, -1 when lower is better, 0 for counts
+    if metric.endswith('per_sec'):
+        return 1
+    if metric.endswith(('seconds', '_ms', '_us')):
+        return -1
+    return 0
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    # Every timing present in both runs: (metric, baseline, current, relative change, regressed)
+    current, previous = _flatten(results['results']), _flatten(baseline['results'])
+    rows = []
+    for metric in sorted(set(current) & set(previous)):
+        sign = direction(metric)
+        if not sign or not previous[metric]:
+            continue
+        delta = current[metric] - previous[metric]
+        change = delta / previous[metric]
+        floor = next(v for unit, v in NOISE_FLOOR.items() if metric.endswith(unit))
+        rows.append((metric, previous[metric], current[metric], change, -sign * change > tolerance and abs(delta) > floor))
+    return rows
+
+def report(rows):
+    for metric, before, after, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{metric:<45} {before:>12} -> {after:>12} ({change:+.1%}){flag}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest, feature, training, prediction and API benchmarks "
+                                                 "on synthetic data scaled from data/raw")
+    parser.add_argument("--factors", type=int, nargs="+", default=DEFAULT_FACTORS)
+    parser.add_argument("--work-dir", default=WORK_DIR, help="Where scaled CSVs and databases are kept")
+    parser.add_argument("--iterations", type=int, default=2000, help="Predict calls per factor")
+    parser.add_argument("--requests", type=int, default=2000, help="API requests in the load test")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--output", default=None, help=f"Results file (default {RESULTS_DIR}/<timestamp>.json)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--verbose", action="store_true", help="Show ingest and training output")
+    args = parser.parse_args()
+
+    run = run_suite(args.factors, args.work_dir, args.iterations, args.requests, args.concurrency,
+                    not args.skip_api, args.verbose)
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(run, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            rows = compare(run, json.load(f), args.tolerance)
+        report(rows)
+        regressions = [row for row in rows if row[4]]
+        print(f"{len(regressions)} regressions beyond {args.tolerance:.0%} against {args.baseline}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,75 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from src.etl.ingest import RAW_PATH, SOURCES, CHUNK_SIZE
+
+# Sources whose rows belong to a match and are copied with it
+MATCH_SOURCES = ['batting', 'bowling', 'partnerships', 'fow', 'ball_by_ball']
+
+def resample_matches(matches, factor, seed=0):
+    # Copy 0 is the real history. Every further copy draws each season's
+    # matches again with replacement, so season sizes, team and venue mix and
+    # every per-match distribution stay those of the real data, while the
+    # copies are not identical. Returns (original match_id, new match_id) pairs.
+    rng = np.random.default_rng(seed)
+    ids = matches['match_id'].to_numpy()
+    seasons = matches['season'].astype(str).to_numpy()
+    groups = [np.flatnonzero(seasons == s) for s in pd.unique(seasons)]
+    next_id = int(ids.max()) + 1
+    parts = [pd.DataFrame({'match_id': ids, 'new_match_id': ids})]
+    for _ in range(1, factor):
+        drawn = np.concatenate([ids[rng.choice(rows, size=len(rows), replace=True)] for rows in groups])
+        parts.append(pd.DataFrame({'match_id': drawn, 'new_match_id': np.arange(next_id, next_id + len(drawn))}))
+        next_id += len(drawn)
+    return pd.concat(parts, ignore_index=True)
+
+def _scaled(frame, mapping):
+    # One output row per (row, draw of its match), renumbered to the new id
+    columns = list(frame.columns)
+    scaled = frame.merge(mapping, on='match_id', how='inner', sort=False)
+    scaled['match_id'] = scaled.pop('new_match_id')
+    return scaled[columns]
+
+def scale_raw(factor, out_path, raw_path=RAW_PATH, seed=0):
+    # Writes a raw directory ingest can load, `factor` times the size of raw_path
+    os.makedirs(out_path, exist_ok=True)
+    start = time.perf_counter()
+    matches = pd.read_csv(os.path.join(raw_path, SOURCES['matches']), dtype=str, keep_default_na=False)
+    mapping = resample_matches(matches.assign(match_id=pd.to_numeric(matches['match_id'])), factor, seed)
+    mapping = mapping.astype(str)
+    rows = {}
+
+    players = os.path.join(raw_path, SOURCES['players'])
+    if os.path.exists(players):
+        pd.read_csv(players, dtype=str, keep_default_na=False).to_csv(os.path.join(out_path, SOURCES['players']), index=False)
+
+    scaled = _scaled(matches, mapping)
+    scaled.to_csv(os.path.join(out_path, SOURCES['matches']), index=False)
+    rows['matches'] = len(scaled)
+
+    for source in MATCH_SOURCES:
+        path = os.path.join(raw_path, SOURCES[source])
+        if not os.path.exists(path):
+            continue
+        target = os.path.join(out_path, SOURCES[source])
+        rows[source] = 0
+        # Read as strings so values are written back exactly as they were;
+        # chunked because ball-by-ball scaled 1000x does not fit in memory
+        for i, chunk in enumerate(pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=CHUNK_SIZE * 10)):
+            part = _scaled(chunk, mapping)
+            part.to_csv(target, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+            rows[source] += len(part)
+    print(f"Scaled {raw_path} {factor}x into {out_path} in {time.perf_counter() - start:.1f}s: "
+          + ", ".join(f"{name} {n:,}" for name, n in rows.items()))
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic raw data directory N times the size of data/raw")
+    parser.add_argument("--factor", type=int, default=10)
+    parser.add_argument("--out", default=None, help="Output directory (default data/synthetic/x<factor>)")
+    parser.add_argument("--raw-path", default=RAW_PATH)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    scale_raw(args.factor, args.out or f"data/synthetic/x{args.factor}", args.raw_path, args.seed)
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text
+from src.etl.schema import get_engine
+
+CACHE_TTL = int(os.environ.get('IPL_CACHE_TTL', 300))
+CACHE_MAX_ENTRIES = int(os.environ.get('IPL_CACHE_MAX_ENTRIES', 4096))
+CACHE_MAX_BYTES = int(os.environ.get('IPL_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+# Browser freshness; after that clients revalidate with If-None-Match
+CACHE_MAX_AGE = int(os.environ.get('IPL_CACHE_MAX_AGE', 60))
+# Optional sqlite file shared by all workers on the host
+CACHE_STORE = os.environ.get('IPL_CACHE_STORE')
+# How often the data version is re-read from the database
+VERSION_CHECK_SECONDS = float(os.environ.get('IPL_CACHE_VERSION_CHECK', 1.0))
+
+class SharedStore:
+    # Second-level cache in a local sqlite file, so workers reuse each other's entries
+    def __init__(self, path):
+        self.path = path
+        self.writes = 0
+        self.connect()
+        # sqlite connections must not cross a fork; each worker opens its own
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.connect)
+
+    def connect(self):
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS response_cache "
+                          "(key TEXT PRIMARY KEY, etag TEXT, body BLOB, expires_at REAL)")
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT etag, body, expires_at FROM response_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[2] < time.time():
+            return None
+        return row
+
+    def set(self, key, etag, body, expires_at):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?)", (key, etag, body, expires_at))
+            self.writes += 1
+            if self.writes % 256 == 0:
+                self.conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (time.time(),))
+
+class ResponseCache:
+    # In-process LRU with a TTL and a bound on both entry count and total body size
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL, store=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.store = store
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[2] >= now:
+                    self.entries.move_to_end(key)
+                    return entry
+                self._remove(key)
+        if self.store is not None:
+            entry = self.store.get(key)
+            if entry is not None:
+                self._put(key, entry)
+                return entry
+        return None
+
+    def set(self, key, etag, body):
+        entry = (etag, body, time.time() + self.ttl)
+        self._put(key, entry)
+        if self.store is not None:
+            self.store.set(key, *entry)
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _put(self, key, entry):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = entry
+            self.size += len(entry[1])
+            while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+                self._remove(next(iter(self.entries)))
+
+    def _remove(self, key):
+        etag, body, _ = self.entries.pop(key)
+        self.size -= len(body)
+
+class DataVersion:
+    # Ingest bumps data_version; re-read at most every VERSION_CHECK_SECONDS
+    def __init__(self, check_seconds=VERSION_CHECK_SECONDS):
+        self.check_seconds = check_seconds
+        self.version = None
+        self.checked_at = 0.0
+
+    def current(self):
+        now = time.monotonic()
+        if self.version is None or now - self.checked_at >= self.check_seconds:
+            with get_engine().connect() as conn:
+                try:
+                    self.version = conn.execute(text("SELECT version FROM data_version WHERE id = 1")).scalar() or 0
+                except Exception:
+                    # Database created before data_version existed
+                    self.version = 0
+            self.checked_at = now
+        return self.version
+
+response_cache = ResponseCache(store=SharedStore(CACHE_STORE) if CACHE_STORE else None)
+data_version = DataVersion()
+
+def cache_key(request, version):
+    params = '&'.join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"{version}:{request.url.path}?{params}"
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    return header.strip() == '*' or etag in [tag.strip() for tag in header.split(',')]
+
+def cached_response(request: Request, build):
+    # Serve a read-only JSON payload from cache; build() only runs on a miss
+    version = data_version.current()
+    key = cache_key(request, version)
+    entry = response_cache.get(key)
+    if entry is None:
+        body = json.dumps(jsonable_encoder(build()), separators=(',', ':')).encode()
+        etag = f'"{version}-{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        entry = response_cache.set(key, etag, body)
+
+    etag, body, _ = entry
+    headers = {'ETag': etag, 'Cache-Control': f'public, max-age={CACHE_MAX_AGE}'}
+    if _etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type='application/json', headers=headers)
@@ -0,0 +1,153 @@
+import csv
+import io
+import json
+import zlib
+from sqlalchemy import select, Integer, BigInteger, Float, Boolean, Date, DateTime
+from src.etl.schema import (get_engine, Player, Match, BattingCard, BowlingCard, BallByBall, Partnership,
+                            FallOfWicket)
+
+EXPORT_PAGE_SIZE = 5000
+# Dataset -> table; all are paged on their single-column primary key
+DATASETS = {
+    'players': Player.__table__,
+    'matches': Match.__table__,
+    'batting_cards': BattingCard.__table__,
+    'bowling_cards': BowlingCard.__table__,
+    'ball_by_ball': BallByBall.__table__,
+    'partnerships': Partnership.__table__,
+    'fall_of_wickets': FallOfWicket.__table__,
+}
+MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+def primary_key(table):
+    return list(table.primary_key.columns)[0]
+
+def export_query(table, season=None, match_id=None):
+    query = select(table)
+    if season is not None:
+        if 'season' in table.c:
+            query = query.where(table.c.season == season)
+        elif 'match_id' in table.c:
+            query = query.where(table.c.match_id.in_(select(Match.match_id).where(Match.season == season)))
+        else:
+            raise ValueError(f"{table.name} cannot be filtered by season")
+    if match_id is not None:
+        if 'match_id' not in table.c:
+            raise ValueError(f"{table.name} cannot be filtered by match")
+        query = query.where(table.c.match_id == match_id)
+    return query
+
+def iter_pages(table, query, after=None, limit=None, page_size=EXPORT_PAGE_SIZE, engine=None):
+    # Keyset pagination: each page starts after the last key of the previous
+    # one, so page N costs the same as page 1. Each page is fetched whole and
+    # the connection released before it is yielded, so a slow client never
+    # holds one open.
+    engine = engine or get_engine()
+    pk = primary_key(table)
+    sent = 0
+    while limit is None or sent < limit:
+        size = page_size if limit is None else min(page_size, limit - sent)
+        page = query.order_by(pk).limit(size)
+        if after is not None:
+            page = page.where(pk > after)
+        with engine.connect() as conn:
+            rows = conn.execute(page).fetchall()
+        if not rows:
+            return
+        yield rows
+        sent += len(rows)
+        after = rows[-1]._mapping[pk.name]
+        if len(rows) < size:
+            return
+
+def _ndjson(columns, pages):
+    names = [col.name for col in columns]
+    for rows in pages:
+        yield ''.join(json.dumps(dict(zip(names, row)), default=str) + '\n' for row in rows).encode()
+
+def _csv(columns, pages):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([col.name for col in columns])
+    for rows in pages:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def arrow_schema(columns):
+    import pyarrow as pa
+    types = [(BigInteger, pa.int64()), (Integer, pa.int64()), (Float, pa.float64()), (Boolean, pa.bool_()),
+             (DateTime, pa.timestamp('us')), (Date, pa.date32())]
+    fields = []
+    for col in columns:
+        arrow_type = next((t for sql_type, t in types if isinstance(col.type, sql_type)), pa.string())
+        fields.append(pa.field(col.name, arrow_type))
+    return pa.schema(fields)
+
+def _arrow(columns, pages):
+    # Arrow IPC stream: schema up front, then one record batch per page,
+    # each handed on as soon as it is written
+    import pyarrow as pa
+    schema = arrow_schema(columns)
+    buffer = io.BytesIO()
+
+    def drain():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    with pa.ipc.new_stream(buffer, schema) as writer:
+        yield drain()
+        for rows in pages:
+            arrays = [pa.array([row[i] for row in rows], type=field.type) for i, field in enumerate(schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            yield drain()
+    yield drain()
+
+ENCODERS = {'ndjson': _ndjson, 'csv': _csv, 'arrow': _arrow}
+
+def arrow_available():
+    try:
+        import pyarrow # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def accepts_gzip(accept_encoding):
+    # gzip only when the client allows it with a non-zero q-value, directly or via *
+    qualities = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.strip().lower()] = quality
+    return qualities.get('gzip', qualities.get('x-gzip', qualities.get('*', 0.0))) > 0
+
+def gzip_stream(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31) # 31 = gzip container
+    for chunk in chunks:
+        # Sync flush per page so the client can decode each page as it arrives
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+def export_stream(dataset, fmt, season=None, match_id=None, after=None, limit=None, gzip=False,
+                  page_size=EXPORT_PAGE_SIZE, engine=None):
+    table = DATASETS[dataset]
+    query = export_query(table, season, match_id)
+    chunks = ENCODERS[fmt](list(table.columns), iter_pages(table, query, after, limit, page_size, engine))
+    return gzip_stream(chunks) if gzip else chunks
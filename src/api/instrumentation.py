@@ -0,0 +1,63 @@
+import time
+from src.observability.metrics import REGISTRY, query_stats
+from src.observability.profiler import PROFILE_SLOW_MS
+
+REQUEST_SECONDS = REGISTRY.histogram('ipl_http_request_seconds', 'Request latency by route, until the body is sent',
+                                     ['method', 'route', 'status'])
+REQUEST_QUERIES = REGISTRY.histogram('ipl_http_request_queries', 'SQL statements issued per request', ['route'],
+                                     buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250))
+IN_FLIGHT = REGISTRY.gauge('ipl_http_requests_in_flight', 'Requests currently being served')
+
+def route_label(scope):
+    # The route template, not the raw path, so player ids don't explode the series
+    route = scope.get('route')
+    template = getattr(route, 'path_format', None) or getattr(route, 'path', None)
+    if not template:
+        return 'unmatched'
+    # Routes of an included router may not carry its prefix; take it from the path
+    extra = scope['path'].rstrip('/').count('/') - template.rstrip('/').count('/')
+    if extra > 0:
+        template = '/'.join(scope['path'].split('/')[:extra + 1]) + template
+    return template
+
+class MetricsMiddleware:
+    # Plain ASGI middleware rather than BaseHTTPMiddleware: it times streamed
+    # bodies to the last chunk and adds no per-request task
+    def __init__(self, app, profiler=None, slow_ms=PROFILE_SLOW_MS):
+        self.app = app
+        self.profiler = profiler
+        self.slow_seconds = float(slow_ms) / 1000 if slow_ms else None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        stats = {'queries': 0, 'seconds': 0.0}
+        token = query_stats.set(stats)
+        status = [500]
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+                headers = list(message.get('headers', []))
+                # Visible in browser dev tools next to the request
+                timing = (f'db;dur={stats["seconds"] * 1000:.1f};desc="{stats["queries"]} queries", '
+                          f'app;dur={(time.perf_counter() - start) * 1000:.1f}')
+                headers.append((b'server-timing', timing.encode()))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            IN_FLIGHT.dec()
+            query_stats.reset(token)
+            end = time.perf_counter()
+            route = route_label(scope)
+            REQUEST_SECONDS.observe(end - start, method=scope['method'], route=route, status=status[0])
+            REQUEST_QUERIES.observe(stats['queries'], route=route)
+            if self.profiler is not None and self.slow_seconds is not None and end - start >= self.slow_seconds:
+                path = self.profiler.dump(f"{scope['method']} {route}", start, end)
+                if path:
+                    print(f"Slow request {scope['method']} {scope['path']} ({(end - start) * 1000:.0f} ms), profile in {path}")
@@ -1,8 +1,107 @@
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from src.api.routes import router as api_router
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy.orm import Session
+from src.api.cache import data_version
+from src.api.routes import (router as api_router, predictor, current_season_index, current_matchups,
+                            current_outcome_model)
+from src.api.search import player_search
+from src.api.instrumentation import MetricsMiddleware
+from src.etl.schema import get_engine
+from src.observability.metrics import REGISTRY, install_sql_hooks
+from src.observability.process import memory_usage, process_uptime
+from src.observability.profiler import slow_request_profiler
 
-app = FastAPI(title="IPL Performance Analytics")
+# "background": serve at once and warm caches in a thread, /ready says when done;
+# "startup": warm before accepting requests
+WARMUP = os.environ.get('IPL_WARMUP', 'background')
+
+# Time every SQL statement, per request and process-wide
+install_sql_hooks()
+profiler = slow_request_profiler()
+
+READY_SECONDS = REGISTRY.gauge('ipl_ready_seconds', 'Seconds from process start until warm-up finished')
+MEMORY_BYTES = REGISTRY.gauge('ipl_process_memory_bytes', 'Memory of this worker process', ['kind'])
+
+def build_search_index():
+    # Build the player name index up front so the first typeahead is fast
+    with Session(get_engine()) as session:
+        player_search.get(session)
+
+def load_model():
+    # Pay the model load at startup rather than on the first /predict
+    current = predictor.get()
+    current.sync_features(data_version.current())
+    current.load_model()
+
+# Everything a first request would otherwise build or load, in order
+WARMUP_STEPS = [
+    ('model', load_model),
+    ('player_search', build_search_index),
+    ('season_index', current_season_index),
+    ('matchups', current_matchups),
+    ('simulation', current_outcome_model),
+]
+
+class Readiness:
+    def __init__(self, steps=WARMUP_STEPS):
+        self.steps = steps
+        self.components = {name: {'status': 'pending'} for name, _ in steps}
+        self.ready_after = None
+        self.done = threading.Event()
+
+    def warm_up(self):
+        # A failed step is reported but does not block readiness: the
+        # endpoints that need it fall back or return their own errors
+        for name, step in self.steps:
+            start = time.perf_counter()
+            try:
+                step()
+                status = 'ready'
+            except Exception as e:
+                print(f"Warm-up of {name} failed: {e}")
+                status = f"failed: {e}"
+            self.components[name] = {'status': status, 'seconds': round(time.perf_counter() - start, 3)}
+        self.ready_after = process_uptime()
+        READY_SECONDS.set(round(self.ready_after, 3))
+        self.done.set()
+
+    def report(self):
+        return {'ready': self.done.is_set(), 'pid': os.getpid(), 'ready_after_seconds': self.ready_after,
+                'components': self.components, 'memory': memory_usage()}
+
+readiness = Readiness()
+
+def start_background_tasks():
+    # Pick up models promoted to the registry without a restart
+    predictor.get().start_watcher()
+
+@asynccontextmanager
+async def lifespan(app):
+    # A worker forked by src.api.serve arrives already warm
+    if readiness.done.is_set():
+        start_background_tasks()
+    elif WARMUP == 'startup':
+        readiness.warm_up()
+        start_background_tasks()
+    else:
+        def warm():
+            readiness.warm_up()
+            start_background_tasks()
+        threading.Thread(target=warm, name="warm-up", daemon=True).start()
+    if profiler is not None:
+        profiler.start()
+    yield
+    if profiler is not None:
+        profiler.stop()
+    if predictor.loaded:
+        predictor.get().stop_watcher()
+
+app = FastAPI(title="IPL Performance Analytics", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,8 +111,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware, profiler=profiler)
+
 app.include_router(api_router, prefix="/api")
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text format; each worker process reports its own series
+    for kind, value in memory_usage().items():
+        MEMORY_BYTES.set(value, kind=kind)
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+def ready():
+    # Readiness probe: 503 until the model and caches are warm
+    return JSONResponse(readiness.report(), status_code=200 if readiness.done.is_set() else 503)
+
 @app.get("/")
 def health_check():
     return {"status": "ok", "message": "IPL Analytics API is running"}
@@ -1,13 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import csv
+import io
+import json
+import threading
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import func, case, desc
-from src.etl.schema import get_engine, Player, BattingCard, Match, BowlingCard
-from src.ml.predict import Predictor
-from typing import List, Optional
-from pydantic import BaseModel
+from src.etl.schema import (get_engine, Player, BattingCard, Match, BowlingCard, PlayerCareerStats, BowlingCareerStats,
+                            Leaderboard, PartnershipPairStats, TeamWicketStats)
+from src.etl.leaderboards import ALL_TIME, CATEGORIES, LEADERBOARD_SIZE
+from src.api.cache import cached_response, data_version
+from src.api.export import DATASETS, MEDIA_TYPES, export_stream, export_query, arrow_available, accepts_gzip
+from src.api.search import player_search
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field, ValidationError
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 router = APIRouter()
-predictor = Predictor()
+
+# The season index, matchup store and simulation model are numpy-backed; their
+# modules are imported on first use so importing the API does not load numpy
+def current_season_index():
+    from src.etl.season_index import season_index
+    return season_index.get(data_version.current())
+
+def current_matchups():
+    from src.etl.matchups import matchup_store
+    return matchup_store.get(data_version.current())
+
+def current_outcome_model():
+    from src.ml.simulate import outcome_model
+    return outcome_model.get(data_version.current())
+
+class LazyPredictor:
+    # Imports the model stack (xgboost, pandas) on first use instead of when
+    # the API module loads, so health checks and player endpoints start fast
+    def __init__(self):
+        self.predictor = None
+        self.lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.predictor is not None
+
+    def get(self):
+        if self.predictor is None:
+            with self.lock:
+                if self.predictor is None:
+                    from src.ml.predict import Predictor
+                    self.predictor = Predictor()
+        return self.predictor
+
+predictor = LazyPredictor()
 
 def get_db():
     engine = get_engine()
@@ -24,6 +68,12 @@ class PlayerSchema(BaseModel):
     class Config:
         from_attributes = True
 
+class PlayerSearchResults(BaseModel):
+    total: int
+    limit: int
+    offset: int
+    results: List[PlayerSchema]
+
 class PlayerStats(BaseModel):
     matches: int
     runs: int
@@ -33,6 +83,88 @@ class PlayerStats(BaseModel):
     hundreds: int
     fifties: int
 
+class BowlingStats(BaseModel):
+    innings: int
+    overs: float
+    runs_conceded: int
+    wickets: int
+    economy: float
+    average: float
+    four_wickets: int
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    player_id: int
+    name: Optional[str] = None
+    value: float
+    matches: int
+
+class LeaderboardResponse(BaseModel):
+    category: str
+    season: Optional[int] = None
+    min_balls: int
+    entries: List[LeaderboardEntry]
+
+class MatchupStats(BaseModel):
+    balls: int
+    runs: int
+    dismissals: int
+    dots: int
+    fours: int
+    sixes: int
+    strike_rate: float
+    average: Optional[float] = None
+
+class HeadToHead(MatchupStats):
+    batter_id: int
+    bowler_id: int
+
+class Opponent(MatchupStats):
+    player_id: int
+
+class PartnershipStats(BaseModel):
+    player_a: int
+    player_b: int
+    stands: int
+    runs: int
+    balls: int
+    best: int
+    average: float
+    run_rate: float
+
+class Partner(PartnershipStats):
+    partner_id: int
+    partner_name: Optional[str] = None
+
+class WicketCollapse(BaseModel):
+    wicket: int
+    falls: int
+    collapses: int
+    collapse_rate: float
+    avg_runs_added: float
+
+class SimulationRequest(BaseModel):
+    batting_team: str
+    bowling_team: str
+    venue: str
+    simulations: Optional[int] = Field(None, ge=100, le=200000) # default: simulate.DEFAULT_SIMULATIONS
+    target: Optional[int] = None
+    seed: Optional[int] = None
+
+class InningsSummary(BaseModel):
+    mean: float
+    quantiles: Dict[str, float]
+    mean_wickets: float
+
+class SimulationResponse(BaseModel):
+    batting: str
+    bowling: str
+    venue: str
+    simulations: int
+    first_innings: InningsSummary
+    second_innings: Optional[InningsSummary] = None
+    win_probability: float
+
 class PredictionRequest(BaseModel):
     season: int = 2024
     venue: str
@@ -44,61 +176,328 @@ class PredictionRequest(BaseModel):
 
 class PredictionResponse(BaseModel):
     predicted_runs: float
+    model_version: Optional[str] = None
+
+class BatchPredictionRow(BaseModel):
+    index: int
+    predicted_runs: Optional[float] = None
+    error: Optional[str] = None
+
+class BatchPredictionResponse(BaseModel):
+    model_version: Optional[str] = None
+    count: int
+    errors: int
+    results: List[BatchPredictionRow]
+
+MAX_BATCH_ROWS = 10000
 
 @router.get("/players", response_model=List[PlayerSchema])
-def list_players(search: Optional[str] = None, limit: int = 10, offset: int = 0, db: Session = Depends(get_db)):
-    query = db.query(Player)
-    if search:
-        query = query.filter(Player.name.ilike(f"%{search}%"))
-    return query.limit(limit).offset(offset).all()
+def list_players(request: Request, search: Optional[str] = None, limit: int = 10, offset: int = 0,
+                 after_id: Optional[int] = None, db: Session = Depends(get_db)):
+    def build():
+        if search:
+            return player_search.get(db).search(search, limit, offset)[1]
+        query = db.query(Player).order_by(Player.player_id)
+        if after_id is not None:
+            # Keyset paging: pass the last player_id of the previous page
+            query = query.filter(Player.player_id > after_id)
+        else:
+            query = query.offset(offset)
+        return [PlayerSchema.model_validate(p) for p in query.limit(limit).all()]
+    return cached_response(request, build)
+
+@router.get("/players/search", response_model=PlayerSearchResults)
+def search_players(request: Request, q: str, limit: int = Query(10, ge=1, le=100), offset: int = Query(0, ge=0),
+                   db: Session = Depends(get_db)):
+    # Typeahead: served from the in-memory name index, ranked by relevance
+    def build():
+        total, results = player_search.get(db).search(q, limit, offset)
+        return {"total": total, "limit": limit, "offset": offset, "results": results}
+    return cached_response(request, build)
+
+def _season_range(from_season, to_season):
+    if from_season is not None and to_season is not None and from_season > to_season:
+        raise HTTPException(status_code=400, detail="from_season must not be after to_season")
+    return from_season is not None or to_season is not None
 
 @router.get("/players/{player_id}/stats", response_model=PlayerStats)
-def get_player_stats(player_id: int, db: Session = Depends(get_db)):
-    # Aggregated stats
-    stats = db.query(
-        func.count(BattingCard.match_id).label('matches'),
-        func.sum(BattingCard.runs).label('runs'),
-        func.sum(BattingCard.balls).label('balls'),
-        func.sum(case((BattingCard.runs >= 100, 1), else_=0)).label('hundreds'),
-        func.sum(case((BattingCard.runs >= 50, 1), else_=0)).label('fifties')
-    ).filter(BattingCard.player_id == player_id).first()
-    
-    matches = stats.matches or 0
-    runs = stats.runs or 0
-    balls = stats.balls or 0
-    hundreds = stats.hundreds or 0
-    fifties = stats.fifties or 0 - hundreds
-    
-    outs = db.query(func.count(BattingCard.id)).filter(
-        BattingCard.player_id == player_id, 
-        BattingCard.is_out == True
-    ).scalar() or 0
-    
+def get_player_stats(request: Request, player_id: int, from_season: Optional[int] = None, to_season: Optional[int] = None,
+                     db: Session = Depends(get_db)):
+    if _season_range(from_season, to_season):
+        return cached_response(request, lambda: _player_stats_range(player_id, from_season, to_season))
+    return cached_response(request, lambda: _player_stats(db, player_id))
+
+def _player_stats(db, player_id):
+    # Career totals are materialized at ingest, so this is a primary key lookup
+    stats = db.get(PlayerCareerStats, player_id)
+    if stats is None:
+        return _batting_response({})
+    return _batting_response({'matches': stats.matches, 'runs': stats.runs, 'balls': stats.balls, 'outs': stats.outs,
+                              'hundreds': stats.hundreds, 'fifties': stats.fifties})
+
+def _player_stats_range(player_id, from_season, to_season):
+    # Any season range is two prefix-sum rows subtracted in the season index
+    totals = current_season_index().batting(player_id, from_season, to_season)
+    return _batting_response(totals or {})
+
+def _batting_response(totals):
+    runs = totals.get('runs') or 0
+    balls = totals.get('balls') or 0
+    outs = totals.get('outs') or 0
     avg = runs / outs if outs > 0 else runs
     sr = (runs / balls * 100) if balls > 0 else 0.0
-    
+
     return {
-        "matches": matches,
+        "matches": totals.get('matches') or 0,
         "runs": runs,
         "balls": balls,
         "avg": round(float(avg), 2),
         "strike_rate": round(float(sr), 2),
-        "hundreds": hundreds,
-        "fifties": fifties
+        "hundreds": totals.get('hundreds') or 0,
+        "fifties": totals.get('fifties') or 0
+    }
+
+@router.get("/players/{player_id}/bowling", response_model=BowlingStats)
+def get_player_bowling_stats(request: Request, player_id: int, from_season: Optional[int] = None,
+                             to_season: Optional[int] = None, db: Session = Depends(get_db)):
+    if _season_range(from_season, to_season):
+        return cached_response(request, lambda: _bowling_stats_range(player_id, from_season, to_season))
+    return cached_response(request, lambda: _bowling_stats(db, player_id))
+
+def _bowling_stats(db, player_id):
+    stats = db.get(BowlingCareerStats, player_id)
+    if stats is None:
+        return _bowling_response({})
+    return _bowling_response({'innings': stats.innings, 'balls': stats.balls, 'runs_conceded': stats.runs_conceded,
+                              'wickets': stats.wickets, 'four_wickets': stats.four_wickets})
+
+def _bowling_stats_range(player_id, from_season, to_season):
+    totals = current_season_index().bowling(player_id, from_season, to_season)
+    return _bowling_response(totals or {})
+
+def _bowling_response(totals):
+    balls = totals.get('balls') or 0
+    runs = totals.get('runs_conceded') or 0
+    wickets = totals.get('wickets') or 0
+    economy = runs / balls * 6 if balls > 0 else 0.0
+    average = runs / wickets if wickets > 0 else 0.0
+
+    return {
+        "innings": totals.get('innings') or 0,
+        "overs": balls // 6 + (balls % 6) / 10,
+        "runs_conceded": runs,
+        "wickets": wickets,
+        "economy": round(float(economy), 2),
+        "average": round(float(average), 2),
+        "four_wickets": totals.get('four_wickets') or 0
+    }
+
+def _matchup(stats, **ids):
+    balls, runs, dismissals = stats['balls'], stats['runs'], stats['dismissals']
+    return dict(ids, **stats, strike_rate=round(runs / balls * 100, 2) if balls else 0.0,
+                average=round(runs / dismissals, 2) if dismissals else None)
+
+
+@router.get("/matchups/{batter_id}/{bowler_id}", response_model=HeadToHead)
+def get_head_to_head(request: Request, batter_id: int, bowler_id: int):
+    # Served from the precomputed batter-vs-bowler store (see src/etl/matchups.py)
+    def build():
+        stats = current_matchups().head_to_head(batter_id, bowler_id)
+        return _matchup(stats, batter_id=batter_id, bowler_id=bowler_id)
+    return cached_response(request, build)
+
+@router.get("/players/{player_id}/worst-bowlers", response_model=List[Opponent])
+def get_worst_bowlers(request: Request, player_id: int, limit: int = Query(10, ge=1, le=100),
+                      min_balls: int = Query(6, ge=1)):
+    # Bowlers who dismissed this batter most often, then conceded fewest runs per ball
+    def build():
+        store = current_matchups()
+        return [_matchup(row) for row in store.worst_bowlers(player_id, limit, min_balls)]
+    return cached_response(request, build)
+
+@router.get("/players/{player_id}/best-victims", response_model=List[Opponent])
+def get_best_victims(request: Request, player_id: int, limit: int = Query(10, ge=1, le=100),
+                     min_balls: int = Query(6, ge=1)):
+    def build():
+        store = current_matchups()
+        return [_matchup(row) for row in store.best_victims(player_id, limit, min_balls)]
+    return cached_response(request, build)
+
+def _partnership(stats):
+    return {
+        "player_a": stats.player_a,
+        "player_b": stats.player_b,
+        "stands": stats.stands,
+        "runs": stats.runs,
+        "balls": stats.balls,
+        "best": stats.best or 0,
+        "average": round(stats.runs / stats.stands, 2) if stats.stands else 0.0,
+        "run_rate": round(stats.runs / stats.balls * 6, 2) if stats.balls else 0.0,
+    }
+
+@router.get("/partnerships/{player_id}/{other_id}", response_model=PartnershipStats)
+def get_partnership(request: Request, player_id: int, other_id: int, db: Session = Depends(get_db)):
+    # Pair aggregates are materialized at ingest, lower player id first
+    def build():
+        stats = db.get(PartnershipPairStats, (min(player_id, other_id), max(player_id, other_id)))
+        if stats is None:
+            raise HTTPException(status_code=404, detail="These players have not batted together")
+        return _partnership(stats)
+    return cached_response(request, build)
+
+@router.get("/players/{player_id}/partners", response_model=List[Partner])
+def get_partners(request: Request, player_id: int, limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    def build():
+        rows = db.query(PartnershipPairStats).filter(
+            (PartnershipPairStats.player_a == player_id) | (PartnershipPairStats.player_b == player_id)
+        ).order_by(PartnershipPairStats.runs.desc()).limit(limit).all()
+        partner_ids = [r.player_b if r.player_a == player_id else r.player_a for r in rows]
+        names = dict(db.query(Player.player_id, Player.name).filter(Player.player_id.in_(partner_ids)).all())
+        return [dict(_partnership(r), partner_id=pid, partner_name=names.get(pid)) for r, pid in zip(rows, partner_ids)]
+    return cached_response(request, build)
+
+@router.get("/teams/{team}/collapse", response_model=List[WicketCollapse])
+def get_team_collapse(request: Request, team: str, db: Session = Depends(get_db)):
+    # Share of each wicket that fell within COLLAPSE_RUNS of the previous one
+    def build():
+        rows = db.query(TeamWicketStats).filter(TeamWicketStats.team == team).order_by(TeamWicketStats.wicket).all()
+        if not rows:
+            raise HTTPException(status_code=404, detail=f"No fall-of-wicket data for {team}")
+        return [{
+            "wicket": r.wicket,
+            "falls": r.falls,
+            "collapses": r.collapses,
+            "collapse_rate": round(r.collapses / r.falls, 3) if r.falls else 0.0,
+            "avg_runs_added": round(r.runs_added / r.falls, 2) if r.falls else 0.0,
+        } for r in rows]
+    return cached_response(request, build)
+
+@router.get("/export/{dataset}")
+def export_dataset(request: Request, dataset: str, format: str = "ndjson", season: Optional[int] = None,
+                   match_id: Optional[int] = None, after: Optional[int] = None, limit: Optional[int] = Query(None, ge=1)):
+    # Bulk download streamed page by page (keyset on the primary key); resume
+    # an interrupted export by passing the last key received as `after`
+    if dataset not in DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset {dataset}; use one of {', '.join(DATASETS)}")
+    if format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown format {format}; use one of {', '.join(MEDIA_TYPES)}")
+    if format == "arrow" and not arrow_available():
+        raise HTTPException(status_code=406, detail="Arrow export needs pyarrow installed on the server")
+    try:
+        export_query(DATASETS[dataset], season, match_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    gzip = accepts_gzip(request.headers.get('accept-encoding', ''))
+    headers = {'Content-Disposition': f'attachment; filename="{dataset}.{format}"', 'Vary': 'Accept-Encoding'}
+    if gzip:
+        headers['Content-Encoding'] = 'gzip'
+    return StreamingResponse(export_stream(dataset, format, season, match_id, after, limit, gzip),
+                             media_type=MEDIA_TYPES[format], headers=headers)
+
+@router.get("/leaderboards/{category}", response_model=LeaderboardResponse)
+def get_leaderboard(request: Request, category: str, season: Optional[int] = None,
+                    limit: int = Query(10, ge=1, le=LEADERBOARD_SIZE), db: Session = Depends(get_db)):
+    # Top K read straight from the rankings precomputed at ingest; no season omits it for all time
+    if category not in CATEGORIES:
+        raise HTTPException(status_code=404, detail=f"Unknown leaderboard {category}; use one of {', '.join(CATEGORIES)}")
+    return cached_response(request, lambda: _leaderboard(db, category, season, limit))
+
+def _leaderboard(db, category, season, limit):
+    spec = CATEGORIES[category]
+    rows = db.query(Leaderboard).filter(
+        Leaderboard.season == (season or ALL_TIME),
+        Leaderboard.category == category,
+        Leaderboard.rank <= limit
+    ).order_by(Leaderboard.rank).all()
+    return {
+        "category": category,
+        "season": season,
+        "min_balls": spec.min_balls_season if season else spec.min_balls_all_time,
+        "entries": [{"rank": r.rank, "player_id": r.player_id, "name": r.name,
+                     "value": round(r.value, 2), "matches": r.matches} for r in rows]
     }
 
 @router.post("/predict", response_model=PredictionResponse)
 def predict_runs(request: PredictionRequest):
     try:
-        runs = predictor.predict(
+        current = predictor.get()
+        current.sync_features(data_version.current())
+        model = current.load_model()
+        runs = current.predict(
             season=request.season,
             venue=request.venue,
             team=request.team,
             opposition=request.opposition,
             toss_winner=request.toss_winner,
             toss_choice=request.toss_choice,
-            innings=request.innings
+            innings=request.innings,
+            model=model
         )
-        return {"predicted_runs": round(runs, 2)}
+        return {"predicted_runs": round(runs, 2), "model_version": model.version}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/simulate", response_model=SimulationResponse)
+def simulate(request: SimulationRequest):
+    # Monte Carlo innings from per-over outcome probabilities learned from ball_by_ball
+    from src.ml.simulate import DEFAULT_SIMULATIONS, simulate_match
+    model = current_outcome_model()
+    if not model.balls:
+        raise HTTPException(status_code=503, detail="Simulation unavailable: no ball-by-ball data has been loaded")
+    return simulate_match(model, request.batting_team, request.bowling_team, request.venue,
+                          request.simulations or DEFAULT_SIMULATIONS, request.target, request.seed)
+
+def _parse_batch_body(body, content_type):
+    # JSON array (or {"requests": [...]}), NDJSON, or CSV with a header row
+    text = body.decode('utf-8')
+    if 'csv' in content_type:
+        return list(csv.DictReader(io.StringIO(text)))
+    if 'ndjson' in content_type or 'jsonl' in content_type:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    payload = json.loads(text)
+    if isinstance(payload, dict):
+        payload = payload.get('requests', [])
+    if not isinstance(payload, list):
+        raise ValueError("expected a JSON array of prediction requests")
+    return payload
+
+def _predict_batch(body, content_type):
+    try:
+        raw_rows = _parse_batch_body(body, content_type)
+    except (ValueError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse batch body: {e}")
+    if len(raw_rows) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch limited to {MAX_BATCH_ROWS} rows")
+
+    # Validate row by row so one bad row does not fail the batch
+    results = [BatchPredictionRow(index=i) for i in range(len(raw_rows))]
+    valid_index, valid_rows = [], []
+    for i, raw in enumerate(raw_rows):
+        try:
+            valid_rows.append(PredictionRequest.model_validate(raw).model_dump())
+            valid_index.append(i)
+        except ValidationError as e:
+            results[i].error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+    current = predictor.get()
+    model_version = current.model_version
+    if valid_rows:
+        try:
+            current.sync_features(data_version.current())
+            model = current.load_model()
+            preds = current.predict_batch(valid_rows, model)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        for i, pred in zip(valid_index, preds):
+            results[i].predicted_runs = round(float(pred), 2)
+        model_version = model.version
+
+    return {"model_version": model_version, "count": len(results), "errors": len(results) - len(valid_rows), "results": results}
+
+@router.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_runs_batch(request: Request):
+    # Only the body read is async; parsing, validation, the model load and
+    # feature sync all block, so they run off the event loop together
+    body = await request.body()
+    return await run_in_threadpool(_predict_batch, body, request.headers.get('content-type', ''))
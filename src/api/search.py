@@ -0,0 +1,100 @@
+import heapq
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from src.api.cache import data_version
+from src.etl.schema import Player
+
+GRAM_SIZE = 3
+
+def normalize(text):
+    # Case- and diacritic-insensitive form: "Jasprít  BUMRAH" -> "jasprit bumrah"
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r'[^\w]+', ' ', text.casefold()).strip()
+
+def _grams(text, size):
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+class PlayerSearchIndex:
+    # n-gram postings over normalized names. Any query token of length n is
+    # looked up through the grams of size min(n, GRAM_SIZE), then verified.
+    def __init__(self, players):
+        self.players = players
+        self.names = [normalize(p['name']) for p in players]
+        self.tokens = [name.split() for name in self.names]
+        self.postings = defaultdict(set)
+        for pos, name in enumerate(self.names):
+            for size in range(1, GRAM_SIZE + 1):
+                for gram in _grams(name, size):
+                    self.postings[gram].add(pos)
+
+    def _candidates(self, token):
+        size = min(len(token), GRAM_SIZE)
+        lists = sorted((self.postings.get(g, set()) for g in _grams(token, size)), key=len)
+        if not lists:
+            return set()
+        result = set(lists[0])
+        for other in lists[1:]:
+            result &= other
+            if not result:
+                break
+        return {pos for pos in result if token in self.names[pos]}
+
+    def _score(self, pos, query, query_tokens):
+        # Lower is better: exact name, name prefix, word matches, then plain substrings
+        name = self.names[pos]
+        if name == query:
+            return 0
+        score = 1 if name.startswith(query) else 2
+        words = self.tokens[pos]
+        for token in query_tokens:
+            if token not in words:
+                score += 1 if any(w.startswith(token) for w in words) else 2
+        return score
+
+    def search(self, term, limit=10, offset=0):
+        query = normalize(term)
+        query_tokens = query.split()
+        if not query_tokens:
+            return 0, []
+        matches = None
+        for token in query_tokens:
+            found = self._candidates(token)
+            matches = found if matches is None else matches & found
+            if not matches:
+                return 0, []
+        # Short queries match most names; only rank as many as the page needs
+        ranked = heapq.nsmallest(offset + limit, matches, key=lambda pos: (self._score(pos, query, query_tokens),
+                                                                           len(self.names[pos]), self.names[pos]))
+        return len(matches), [self.players[pos] for pos in ranked[offset:]]
+
+class SearchIndexHolder:
+    # Rebuilds the index whenever ingest bumps the data version
+    def __init__(self):
+        self.index = None
+        self.version = None
+        self.lock = threading.Lock()
+
+    def get(self, db):
+        version = data_version.current()
+        if self.index is None or self.version != version:
+            with self.lock:
+                if self.index is None or self.version != version:
+                    self.index = self.build(db)
+                    self.version = version
+        return self.index
+
+    def build(self, db):
+        rows = db.query(Player).order_by(Player.player_id).all()
+        players = [{
+            'player_id': p.player_id,
+            'name': p.name or "",
+            'batting_style': p.batting_style,
+            'bowling_style': p.bowling_style,
+            'image_url': p.image_url,
+        } for p in rows]
+        return PlayerSearchIndex(players)
+
+player_search = SearchIndexHolder()
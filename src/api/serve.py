@@ -0,0 +1,153 @@
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from src.observability.process import memory_usage, process_uptime
+
+MB = 1024 * 1024
+# A worker that dies sooner than this after starting is failing at startup:
+# restart it with a growing delay, and give up after MAX_FAST_FAILURES in a row
+MIN_UPTIME = 5.0
+MAX_FAST_FAILURES = 5
+MAX_BACKOFF = 30.0
+
+def preload():
+    # Import the app and warm the model and read-only tables once, in the
+    # parent; forked workers share those pages copy-on-write
+    start = time.perf_counter()
+    from src.api.main import app, readiness
+    imported = time.perf_counter()
+    readiness.warm_up()
+    warmed = time.perf_counter()
+    # Move everything allocated so far out of the collector's generations:
+    # collections in the workers then never write to these objects' headers,
+    # which would copy their pages
+    gc.collect()
+    gc.freeze()
+    timings = {'import': imported - start, 'warm_up': warmed - imported,
+               **{name: c.get('seconds', 0.0) for name, c in readiness.components.items()}}
+    return app, timings
+
+def bind(host, port, backlog=2048):
+    # One listening socket, inherited by every worker; the kernel spreads accepts
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(app, sock, log_level):
+    import uvicorn
+    for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGCHLD):
+        signal.signal(sig, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level=log_level, lifespan='on')
+    uvicorn.Server(config).run(sockets=[sock])
+
+def memory_report(workers):
+    rows = [('parent', os.getpid(), memory_usage())]
+    rows += [(f"worker {i}", pid, memory_usage(pid)) for pid, i in sorted(workers.items(), key=lambda w: w[1])]
+    print(f"{'process':>10} {'pid':>8} {'rss MB':>8} {'pss MB':>8} {'shared MB':>10} {'private MB':>11}")
+    for name, pid, mem in rows:
+        if mem:
+            print(f"{name:>10} {pid:>8} {mem['rss'] / MB:>8.1f} {mem.get('pss', 0) / MB:>8.1f} "
+                  f"{mem.get('shared', 0) / MB:>10.1f} {mem.get('private', 0) / MB:>11.1f}")
+    mems = [mem for _, _, mem in rows if mem]
+    print(f"Total: {sum(m['rss'] for m in mems) / MB:.1f} MB rss, {sum(m.get('pss', 0) for m in mems) / MB:.1f} MB pss "
+          "(pss counts shared pages once)")
+
+def serve(host="127.0.0.1", port=8000, workers=2, log_level="warning", report_after=5.0):
+    app, timings = preload()
+    print(f"Preloaded in {process_uptime():.2f}s since process start: "
+          + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+    sock = bind(host, port)
+    children = {}
+    started = {}
+    failures = {}
+    restarts = {} # index -> monotonic time to respawn at
+    stopping = []
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(app, sock, log_level)
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except BaseException:
+                # os._exit skips the interpreter's own report, so print it here
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stderr.flush()
+                os._exit(code)
+        children[pid] = index
+        started[index] = time.monotonic()
+
+    def stop(signum, frame):
+        stopping.append(signum)
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for i in range(workers):
+        spawn(i)
+    print(f"Serving on http://{host}:{port} with {workers} workers (parent {os.getpid()})")
+
+    # Supervise: replace workers that die, report memory once they have started
+    report_at = time.monotonic() + report_after if report_after else None
+    while children or (restarts and not stopping):
+        pid, status = os.waitpid(-1, os.WNOHANG) if children else (0, 0)
+        if pid:
+            index = children.pop(pid)
+            if stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if time.monotonic() - started[index] < MIN_UPTIME:
+                failures[index] = failures.get(index, 0) + 1
+            else:
+                failures[index] = 0
+            if failures[index] >= MAX_FAST_FAILURES:
+                print(f"Worker {index} (pid {pid}) failed {failures[index]} times right after starting "
+                      f"(last status {code}), shutting down")
+                stop(signal.SIGTERM, None)
+                restarts.clear()
+                continue
+            delay = min(MAX_BACKOFF, 2 ** failures[index] - 1) if failures[index] else 0.0
+            print(f"Worker {index} (pid {pid}) exited with status {code}, restarting"
+                  + (f" in {delay:.0f}s" if delay else ""))
+            restarts[index] = time.monotonic() + delay
+            continue
+        for index, at in list(restarts.items()):
+            if time.monotonic() >= at and not stopping:
+                del restarts[index]
+                spawn(index)
+        if report_at is not None and time.monotonic() >= report_at:
+            memory_report(children)
+            report_at = None
+        time.sleep(0.2)
+    sock.close()
+    if any(count >= MAX_FAST_FAILURES for count in failures.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the API from workers forked after the model and caches are loaded")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="warning")
+    parser.add_argument("--report-after", type=float, default=5.0,
+                        help="Print per-worker memory this many seconds after start (0 = never)")
+    args = parser.parse_args()
+    if not hasattr(os, 'fork'):
+        sys.exit("Preforked serving needs os.fork; use uvicorn --workers on this platform")
+    serve(args.host, args.port, args.workers, args.log_level, args.report_after)
@@ -0,0 +1,187 @@
+from datetime import datetime
+from sqlalchemy import select, delete, insert, update, func, case, cast, or_, Integer
+from sqlalchemy.orm import aliased
+from src.ml.feature_store import update_feature_store
+from src.etl.leaderboards import refresh_leaderboards
+from src.etl.schema import (BattingCard, BowlingCard, Match, PlayerCareerStats, BowlingCareerStats,
+                            BattingSeasonStats, BowlingSeasonStats, Partnership, FallOfWicket,
+                            PartnershipPairStats, TeamWicketStats, DataVersion)
+from src.observability.metrics import stage, format_timings
+
+# Past this many new matches a full rebuild is cheaper than per-player refreshes
+FULL_REBUILD_MATCHES = 500
+# A wicket falling within this many runs of the previous one counts as a collapse
+COLLAPSE_RUNS = 10
+
+def overs_to_balls(overs):
+    # Cricket notation: 3.4 overs is 3 overs and 4 balls
+    whole = cast(overs, Integer)
+    return whole * 6 + cast(func.round((overs - whole) * 10), Integer)
+
+def _batting_totals():
+    bc = BattingCard.__table__
+    return select(
+        bc.c.player_id,
+        func.count(bc.c.match_id),
+        func.coalesce(func.sum(bc.c.runs), 0),
+        func.coalesce(func.sum(bc.c.balls), 0),
+        func.sum(case((bc.c.is_out == True, 1), else_=0)),
+        func.coalesce(func.sum(bc.c.fours), 0),
+        func.coalesce(func.sum(bc.c.sixes), 0),
+        func.sum(case((bc.c.runs >= 100, 1), else_=0)),
+        func.sum(case(((bc.c.runs >= 50) & (bc.c.runs < 100), 1), else_=0)),
+        func.coalesce(func.max(bc.c.runs), 0),
+    ).where(bc.c.player_id.isnot(None)).group_by(bc.c.player_id)
+
+def _bowling_totals():
+    bw = BowlingCard.__table__
+    return select(
+        bw.c.player_id,
+        func.count(bw.c.match_id),
+        func.coalesce(func.sum(overs_to_balls(bw.c.overs)), 0),
+        func.coalesce(func.sum(bw.c.runs_conceded), 0),
+        func.coalesce(func.sum(bw.c.wickets), 0),
+        func.sum(case((bw.c.wickets >= 4, 1), else_=0)),
+    ).where(bw.c.player_id.isnot(None)).group_by(bw.c.player_id)
+
+def _refresh(conn, target, card, totals, match_ids):
+    columns = [col.name for col in target.columns]
+    if match_ids is None:
+        conn.execute(delete(target))
+    else:
+        # Only players who appear in the new matches need recomputing
+        affected = select(card.c.player_id).where(card.c.match_id.in_(match_ids)).distinct()
+        conn.execute(delete(target).where(target.c.player_id.in_(affected)))
+        totals = totals.where(card.c.player_id.in_(affected))
+    result = conn.execute(insert(target).from_select(columns, totals))
+    return result.rowcount
+
+def refresh_career_stats(conn, match_ids=None):
+    # One grouped pass per card table; match_ids=None rebuilds everything
+    if match_ids is not None and len(match_ids) > FULL_REBUILD_MATCHES:
+        match_ids = None
+    if match_ids is not None:
+        match_ids = list(match_ids)
+    batting = _refresh(conn, PlayerCareerStats.__table__, BattingCard.__table__, _batting_totals(), match_ids)
+    bowling = _refresh(conn, BowlingCareerStats.__table__, BowlingCard.__table__, _bowling_totals(), match_ids)
+    return {'player_career_stats': batting, 'bowling_career_stats': bowling}
+
+def _season_batting(seasons=None):
+    bc, m = BattingCard.__table__, Match.__table__
+    query = select(
+        bc.c.player_id,
+        m.c.season,
+        func.count(bc.c.match_id),
+        func.coalesce(func.sum(bc.c.runs), 0),
+        func.coalesce(func.sum(bc.c.balls), 0),
+        func.sum(case((bc.c.is_out == True, 1), else_=0)),
+        func.sum(case((bc.c.runs >= 100, 1), else_=0)),
+        func.sum(case(((bc.c.runs >= 50) & (bc.c.runs < 100), 1), else_=0)),
+    ).join(m, m.c.match_id == bc.c.match_id).where(bc.c.player_id.isnot(None), m.c.season.isnot(None))
+    if seasons is not None:
+        query = query.where(m.c.season.in_(seasons))
+    return query.group_by(bc.c.player_id, m.c.season)
+
+def _season_bowling(seasons=None):
+    bw, m = BowlingCard.__table__, Match.__table__
+    query = select(
+        bw.c.player_id,
+        m.c.season,
+        func.count(bw.c.match_id),
+        func.coalesce(func.sum(overs_to_balls(bw.c.overs)), 0),
+        func.coalesce(func.sum(bw.c.runs_conceded), 0),
+        func.coalesce(func.sum(bw.c.wickets), 0),
+        func.sum(case((bw.c.wickets >= 4, 1), else_=0)),
+    ).join(m, m.c.match_id == bw.c.match_id).where(bw.c.player_id.isnot(None), m.c.season.isnot(None))
+    if seasons is not None:
+        query = query.where(m.c.season.in_(seasons))
+    return query.group_by(bw.c.player_id, m.c.season)
+
+def refresh_season_stats(conn, seasons=None):
+    # seasons=None rebuilds every season
+    rows = 0
+    for table, totals in [(BattingSeasonStats.__table__, _season_batting(seasons)),
+                          (BowlingSeasonStats.__table__, _season_bowling(seasons))]:
+        clear = delete(table)
+        if seasons is not None:
+            clear = clear.where(table.c.season.in_(seasons))
+        conn.execute(clear)
+        rows += conn.execute(insert(table).from_select([col.name for col in table.columns], totals)).rowcount
+    return rows
+
+def refresh_partnership_stats(conn, match_ids=None):
+    p = Partnership.__table__
+    target = PartnershipPairStats.__table__
+    player_a = case((p.c.player1_id < p.c.player2_id, p.c.player1_id), else_=p.c.player2_id)
+    player_b = case((p.c.player1_id < p.c.player2_id, p.c.player2_id), else_=p.c.player1_id)
+    totals = select(
+        player_a, player_b, func.count(),
+        func.coalesce(func.sum(p.c.runs), 0), func.coalesce(func.sum(p.c.balls), 0), func.max(p.c.runs),
+    ).where(p.c.player1_id.isnot(None), p.c.player2_id.isnot(None)).group_by(player_a, player_b)
+    if match_ids is None:
+        conn.execute(delete(target))
+    else:
+        # Every pair involving a player from the new stands is recomputed
+        players = select(p.c.player1_id).where(p.c.match_id.in_(match_ids)).union(
+            select(p.c.player2_id).where(p.c.match_id.in_(match_ids)))
+        affected = [row[0] for row in conn.execute(players) if row[0] is not None]
+        conn.execute(delete(target).where(or_(target.c.player_a.in_(affected), target.c.player_b.in_(affected))))
+        totals = totals.where(or_(p.c.player1_id.in_(affected), p.c.player2_id.in_(affected)))
+    return conn.execute(insert(target).from_select([col.name for col in target.columns], totals)).rowcount
+
+def refresh_team_wicket_stats(conn, match_ids=None):
+    # Runs added for wicket N = score at wicket N minus score at wicket N-1
+    f = FallOfWicket.__table__
+    prev = aliased(f)
+    added = f.c.runs - func.coalesce(prev.c.runs, 0)
+    totals = select(
+        f.c.team, f.c.wicket, func.count(),
+        func.sum(case((added < COLLAPSE_RUNS, 1), else_=0)), func.coalesce(func.sum(added), 0),
+    ).select_from(f.outerjoin(prev, (prev.c.match_id == f.c.match_id) & (prev.c.innings == f.c.innings)
+                              & (prev.c.wicket == f.c.wicket - 1))
+    ).where(f.c.team.isnot(None), f.c.wicket >= 1).group_by(f.c.team, f.c.wicket)
+    target = TeamWicketStats.__table__
+    if match_ids is None:
+        conn.execute(delete(target))
+    else:
+        teams = [row[0] for row in conn.execute(select(f.c.team).where(f.c.match_id.in_(match_ids)).distinct())]
+        conn.execute(delete(target).where(target.c.team.in_(teams)))
+        totals = totals.where(f.c.team.in_(teams))
+    return conn.execute(insert(target).from_select([col.name for col in target.columns], totals)).rowcount
+
+def affected_seasons(conn, match_ids):
+    m = Match.__table__
+    return set(conn.execute(select(m.c.season).where(m.c.match_id.in_(list(match_ids))).distinct()).scalars())
+
+def bump_data_version(conn):
+    table = DataVersion.__table__
+    version = conn.execute(select(table.c.version).where(table.c.id == 1)).scalar()
+    if version is None:
+        conn.execute(insert(table).values(id=1, version=1, updated_at=datetime.now()))
+        return 1
+    conn.execute(update(table).where(table.c.id == 1).values(version=version + 1, updated_at=datetime.now()))
+    return version + 1
+
+def refresh_aggregates(conn, match_ids=None):
+    # Called at the end of ingest inside its transaction
+    if match_ids is not None and not match_ids:
+        return {}
+    timings = {}
+    with stage('aggregates.career_stats', timings):
+        stats = refresh_career_stats(conn, match_ids)
+    seasons = None if match_ids is None else affected_seasons(conn, match_ids)
+    with stage('aggregates.season_stats', timings):
+        stats['season_stats'] = refresh_season_stats(conn, seasons)
+    with stage('aggregates.leaderboards', timings):
+        stats['leaderboards'] = refresh_leaderboards(conn, seasons)
+    ids = None if match_ids is None else list(match_ids)
+    with stage('aggregates.partnership_pair_stats', timings):
+        stats['partnership_pair_stats'] = refresh_partnership_stats(conn, ids)
+    with stage('aggregates.team_wicket_stats', timings):
+        stats['team_wicket_stats'] = refresh_team_wicket_stats(conn, ids)
+    with stage('aggregates.feature_state', timings):
+        stats['feature_state'] = update_feature_store(conn, rebuild=match_ids is None, match_ids=match_ids)
+    for table, rows in stats.items():
+        print(f"Refreshed {rows} rows in {table}")
+    print(f"Aggregate timings: {format_timings(timings)}")
+    return stats
@@ -0,0 +1,151 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+from sqlalchemy import select, func
+from src.etl.schema import BallByBall, get_engine
+from src.etl.season_index import data_version_of
+
+BALL_STORE_DIR = os.environ.get('IPL_BALL_STORE_DIR', 'data/columnar/ball_by_ball')
+READ_CHUNK = 200000
+# Column -> dtype; integer NULLs are stored as -1 and flag NULLs as False
+COLUMNS = {
+    'match_id': np.int32,
+    'innings_no': np.int8,
+    'over_number': np.int8,
+    'ball_number': np.int8,
+    'batsman_id': np.int32,
+    'bowler_id': np.int32,
+    'total_runs': np.int16,
+    'batsman_runs': np.int16,
+    'is_four': np.bool_,
+    'is_six': np.bool_,
+    'is_wicket': np.bool_,
+    'bowler_wicket': np.bool_, # derived: a wicket credited to the bowler
+}
+# Wickets that fall on a ball but are not credited to the bowler
+NOT_BOWLER_WICKETS = ['run out', 'retired hurt', 'retired out', 'obstructing the field']
+
+def bowler_wickets(is_wicket, dismissal_kind):
+    kind = dismissal_kind.fillna('').astype(str).str.lower()
+    return is_wicket.fillna(False).astype(bool) & ~kind.isin(NOT_BOWLER_WICKETS)
+
+def publish(staging, root, version):
+    # Rename a finished staging dir to <root>/v<version> and drop older versions;
+    # readers that already mapped an old version keep their pages until they close
+    target = os.path.join(root, f"v{version}")
+    shutil.rmtree(target, ignore_errors=True)
+    os.rename(staging, target)
+    for name in os.listdir(root):
+        if name.startswith('v') and name != f"v{version}":
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    return target
+
+def _column(values, dtype):
+    if dtype == np.bool_:
+        return values.fillna(False).astype(bool).to_numpy()
+    return values.fillna(-1).to_numpy(dtype=dtype)
+
+class BallStore:
+    # One typed array per column, rows ordered by (match, innings, over, ball),
+    # plus match_ids/match_offsets so a match is the slice offsets[i]:offsets[i+1]
+    def __init__(self, columns, match_ids, match_offsets, version=None):
+        self.columns = columns
+        self.match_ids = match_ids
+        self.match_offsets = match_offsets
+        self.version = version
+
+    def __len__(self):
+        return len(self.columns['match_id'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def match_slice(self, match_id):
+        pos = int(np.searchsorted(self.match_ids, match_id))
+        if pos == len(self.match_ids) or self.match_ids[pos] != match_id:
+            return slice(0, 0)
+        return slice(int(self.match_offsets[pos]), int(self.match_offsets[pos + 1]))
+
+    def match(self, match_id, names=None):
+        # Views into the mapped columns, no copy
+        rows = self.match_slice(match_id)
+        return {name: self.columns[name][rows] for name in (names or self.columns)}
+
+    @classmethod
+    def write(cls, conn, root=BALL_STORE_DIR, version=None, chunk_size=READ_CHUNK):
+        import pandas as pd # ingest only; the API just maps the files
+        b = BallByBall.__table__
+        total = conn.execute(select(func.count()).select_from(b)).scalar()
+        os.makedirs(root, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.ball_store-', dir=root)
+        os.chmod(staging, 0o755)
+        try:
+            arrays = {name: np.lib.format.open_memmap(os.path.join(staging, f"{name}.npy"), mode='w+',
+                                                      dtype=dtype, shape=(total,))
+                      for name, dtype in COLUMNS.items()}
+            stored = [name for name in COLUMNS if name in b.c]
+            query = select(*[b.c[name] for name in stored], b.c.dismissal_kind).order_by(
+                b.c.match_id, b.c.innings_no, b.c.over_number, b.c.ball_number, b.c.id)
+            pos = 0
+            # Stream the sorted table straight into the mapped files
+            for chunk in pd.read_sql(query, conn, chunksize=chunk_size):
+                end = pos + len(chunk)
+                chunk['bowler_wicket'] = bowler_wickets(chunk['is_wicket'], chunk['dismissal_kind'])
+                for name, dtype in COLUMNS.items():
+                    arrays[name][pos:end] = _column(chunk[name], dtype)
+                pos = end
+            for array in arrays.values():
+                array.flush()
+
+            match_ids, starts = np.unique(arrays['match_id'], return_index=True)
+            offsets = np.append(starts, total).astype(np.int64)
+            np.save(os.path.join(staging, 'match_ids.npy'), match_ids)
+            np.save(os.path.join(staging, 'match_offsets.npy'), offsets)
+            with open(os.path.join(staging, 'meta.json'), 'w') as f:
+                json.dump({'version': version, 'rows': int(total), 'matches': len(match_ids),
+                           'columns': {name: np.dtype(dtype).name for name, dtype in COLUMNS.items()}}, f)
+            del arrays
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return publish(staging, root, version)
+
+    @classmethod
+    def open(cls, path):
+        # Memory-mapped read-only: every worker shares the same page cache
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        def load(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+        return cls({name: load(name) for name in meta['columns']}, load('match_ids'), load('match_offsets'),
+                   meta['version'])
+
+def write_ball_store(engine=None, root=BALL_STORE_DIR):
+    with (engine or get_engine()).connect() as conn:
+        path = BallStore.write(conn, root, data_version_of(conn))
+    store = BallStore.open(path)
+    print(f"Columnar ball-by-ball store with {len(store)} balls in {len(store.match_ids)} matches written to {path}")
+    return store
+
+class BallStoreHolder:
+    # Opens the store ingest wrote for the current data version; None when it
+    # has not been written, so callers fall back to querying ball_by_ball
+    def __init__(self, root=BALL_STORE_DIR):
+        self.root = root
+        self.store = None
+        self.lock = threading.Lock()
+
+    def get(self, version):
+        if self.store is None or self.store.version != version:
+            path = os.path.join(self.root, f"v{version}")
+            if not os.path.exists(os.path.join(path, 'meta.json')):
+                return None
+            with self.lock:
+                if self.store is None or self.store.version != version:
+                    self.store = BallStore.open(path)
+        return self.store
+
+ball_store = BallStoreHolder()
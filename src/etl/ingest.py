@@ -1,141 +1,339 @@
-import pandas as pd
+import argparse
+import hashlib
 import os
-from sqlalchemy.orm import Session
-from src.etl.schema import Match, Player, BallByBall, BattingCard, BowlingCard, get_engine, create_schema
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import insert, delete, select, func
+from sqlalchemy.dialects import sqlite, postgresql
+from src.etl.aggregates import refresh_aggregates, bump_data_version
+from src.etl.columnar import write_ball_store
+from src.etl.matchups import write_matchups
+from src.etl.season_index import write_season_index
+from src.etl.schema import (Match, Player, BallByBall, BattingCard, BowlingCard, Partnership, FallOfWicket, IngestState,
+                            get_engine, create_schema)
+from src.observability.metrics import STAGE_SECONDS, stage, format_timings
+
+RAW_PATH = "data/raw"
+BATCH_SIZE = 5000
+CHUNK_SIZE = 10000 # Ball by ball is read in chunks because it's large
+
+SOURCES = {
+    'players': "ipl_players_info.csv",
+    'matches': "ipl_historical.csv",
+    'batting': "ipl_batting_card.csv",
+    'bowling': "ipl_bowling_card.csv",
+    'partnerships': "ipl_partnership_card.csv",
+    'fow': "ipl_fow_card.csv",
+    'ball_by_ball': "ipl_ball_by_ball_data.csv",
+}
+
+# Natural keys for incremental upserts. Ball by ball has no reliable key
+# (extras repeat ball numbers), so it is only ever appended per new match.
+NATURAL_KEYS = {
+    'players': ['player_id'],
+    'matches': ['match_id'],
+    'batting_cards': ['match_id', 'innings', 'player_id'],
+    'bowling_cards': ['match_id', 'innings', 'player_id'],
+    'partnerships': ['match_id', 'innings', 'wicket'],
+    'fall_of_wickets': ['match_id', 'innings', 'wicket'],
+}
+
+def _to_int(series):
+    return pd.to_numeric(series, errors='coerce').fillna(0).astype(int)
+
+def _to_bool(series):
+    # Flags might be boolean or string
+    if series.dtype == bool:
+        return series
+    return series.astype(str).str.lower() == 'true'
+
+def clean_players(df):
+    return pd.DataFrame({
+        'player_id': df['player_id'],
+        'name': df['player_name'],
+        'batting_style': df['batting_style'],
+        'bowling_style': df['bowling_style'],
+        'image_url': df['image_url'],
+    }).drop_duplicates('player_id', keep='last')
+
+def clean_matches(df):
+    match_date = pd.to_datetime(df['match_date'], errors='coerce')
+    return pd.DataFrame({
+        'match_id': df['match_id'],
+        'season': df['season'],
+        'match_date': match_date.dt.date,
+        'venue_stadium': df['match_venue_stadium'],
+        'venue_city': df['match_venue_city'],
+        'team1_name': df['team1_name'],
+        'team2_name': df['team2_name'],
+        'toss_winner': df['toss_winner'],
+        'toss_winner_choice': df['toss_winner_choice'],
+        'match_winner': df['match_winner'],
+        'result_margin': df['match_result_text'],
+        'team1_score': df['team1_runs_scored'],
+        'team2_score': df['team2_runs_scored'],
+    }).drop_duplicates('match_id', keep='last')
+
+def clean_batting(df):
+    return pd.DataFrame({
+        'match_id': df['match_id'],
+        'innings': df['innings'],
+        'team': df['team'],
+        'player_id': _to_int(df['batsman_id']),
+        'runs': _to_int(df['runs']),
+        'balls': _to_int(df['balls']),
+        'fours': _to_int(df['fours']),
+        'sixes': _to_int(df['sixes']),
+        'strike_rate': pd.to_numeric(df['strikerate'], errors='coerce').fillna(0),
+        'is_out': _to_bool(df['isout']),
+        'wicket_type': df['wickettype'],
+    })
+
+def clean_bowling(df):
+    return pd.DataFrame({
+        'match_id': df['match_id'],
+        'innings': df['innings'],
+        'team': df['team'],
+        'player_id': pd.to_numeric(df['bowler_id'], errors='coerce').astype('Int64'),
+        'overs': pd.to_numeric(df['overs'], errors='coerce'),
+        'runs_conceded': pd.to_numeric(df['conceded'], errors='coerce').astype('Int64'),
+        'wickets': pd.to_numeric(df['wickets'], errors='coerce').astype('Int64'),
+        'economy': pd.to_numeric(df['economy'], errors='coerce'),
+    })
+
+def clean_partnerships(df):
+    df = df.dropna(subset=['for_wicket'])
+    return pd.DataFrame({
+        'match_id': df['match_id'],
+        'innings': df['innings'],
+        'wicket': df['for_wicket'].astype(int),
+        'team': df['team'],
+        'opposition': df['opposition'],
+        'player1_id': pd.to_numeric(df['player1_id'], errors='coerce').astype('Int64'),
+        'player2_id': pd.to_numeric(df['player2_id'], errors='coerce').astype('Int64'),
+        'player1_runs': _to_int(df['player1_runs']),
+        'player2_runs': _to_int(df['player2_runs']),
+        'player1_balls': _to_int(df['player1_balls']),
+        'player2_balls': _to_int(df['player2_balls']),
+        'runs': _to_int(df['partnership_runs']),
+        'balls': _to_int(df['partnership_balls']),
+    }).drop_duplicates(['match_id', 'innings', 'wicket'], keep='last')
+
+def clean_fow(df):
+    # Retirements repeat a wicket number with no overs; keep the actual dismissal
+    df = df.dropna(subset=['wicket']).sort_values('overs', na_position='last', kind='stable')
+    return pd.DataFrame({
+        'match_id': df['match_id'],
+        'innings': df['innings'],
+        'team': df['team'],
+        'player_id': pd.to_numeric(df['player_id'], errors='coerce').astype('Int64'),
+        'wicket': df['wicket'].astype(int),
+        'overs': pd.to_numeric(df['overs'], errors='coerce'),
+        'runs': _to_int(df['runs']),
+    }).drop_duplicates(['match_id', 'innings', 'wicket'], keep='first')
+
+def clean_ball_by_ball(chunk):
+    return pd.DataFrame({
+        'match_id': chunk['match_id'],
+        'innings_no': chunk['innings_no'],
+        'over_number': chunk['over_number'],
+        'ball_number': chunk['ball_number'],
+        'batsman_id': _to_int(chunk['batsman_id']),
+        'bowler_id': _to_int(chunk['bowler_id']),
+        'total_runs': _to_int(chunk['total_runs']),
+        'batsman_runs': _to_int(chunk['batsman_runs']),
+        'is_four': _to_bool(chunk['isfour']),
+        'is_six': _to_bool(chunk['issix']),
+        'is_wicket': _to_bool(chunk['iswicket']),
+        'dismissal_kind': chunk['dismissal_kind'] if 'dismissal_kind' in chunk else None,
+    })
+
+# source -> (table, cleaner, read in chunks)
+LOADERS = {
+    'players': (Player.__table__, clean_players, False),
+    'matches': (Match.__table__, clean_matches, False),
+    'batting': (BattingCard.__table__, clean_batting, False),
+    'bowling': (BowlingCard.__table__, clean_bowling, False),
+    'partnerships': (Partnership.__table__, clean_partnerships, False),
+    'fow': (FallOfWicket.__table__, clean_fow, False),
+    'ball_by_ball': (BallByBall.__table__, clean_ball_by_ball, True),
+}
+
+def file_checksum(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _records(df):
+    # Plain python values with NaN/NaT/NA as None, ready for executemany
+    df = df.astype(object)
+    return df.where(df.notna(), None).to_dict('records')
 
-def load_data():
-    engine = get_engine()
+def bulk_insert(conn, stmt, df, batch_size=BATCH_SIZE):
+    for start in range(0, len(df), batch_size):
+        conn.execute(stmt, _records(df.iloc[start:start + batch_size]))
+    return len(df)
+
+def _dialect_insert(conn, table):
+    # Both dialects share the ON CONFLICT DO UPDATE construct
+    if conn.dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+def upsert_statement(conn, table, keys=None):
+    keys = keys or NATURAL_KEYS[table.name]
+    stmt = _dialect_insert(conn, table)
+    updates = {col.name: stmt.excluded[col.name] for col in table.columns
+               if col.name not in keys and not col.primary_key}
+    return stmt.on_conflict_do_update(index_elements=keys, set_=updates)
+
+def _report(name, rows, elapsed):
+    STAGE_SECONDS.observe(elapsed, stage=f"load.{name}")
+    rate = rows / elapsed if elapsed > 0 else float('inf')
+    print(f"Loaded {rows} rows into {name} in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+    return {'rows': rows, 'seconds': round(elapsed, 3), 'rows_per_sec': round(rate, 1)}
+
+def _new_rows(df, present_ids):
+    # Only matches not already present. The same test for every source, so a
+    # match missing from the database is restored whole whatever its date.
+    return df[~df['match_id'].isin(present_ids)]
+
+def _save_state(conn, source, table, checksum):
+    values = {
+        'checksum': checksum,
+        'row_count': conn.execute(select(func.count()).select_from(table)).scalar(),
+        'updated_at': datetime.now(),
+    }
+    stmt = _dialect_insert(conn, IngestState.__table__).values(source=source, **values)
+    conn.execute(stmt.on_conflict_do_update(index_elements=['source'], set_=values))
+
+def read_state(conn, source):
+    return conn.execute(select(IngestState.__table__).where(IngestState.source == source)).first()
+
+class SourceWriter:
+    # Writes cleaned frames of one source on an open connection. Used by the
+    # sequential loader and by the single writer process of the pipeline.
+    def __init__(self, conn, source, checksum, batch_size=BATCH_SIZE, incremental=False):
+        self.conn = conn
+        self.source = source
+        self.table = LOADERS[source][0]
+        self.checksum = checksum
+        self.batch_size = batch_size
+        self.incremental = incremental
+        self.rows = 0
+        self.present_ids = None
+        self.match_ids = set()
+
+        if incremental:
+            if 'match_id' in self.table.columns and source != 'players':
+                self.present_ids = {row[0] for row in conn.execute(select(self.table.c.match_id).distinct())}
+            self.stmt = upsert_statement(conn, self.table) if self.table.name in NATURAL_KEYS else insert(self.table)
+        else:
+            conn.execute(delete(self.table))
+            self.stmt = insert(self.table)
+
+    def write(self, df):
+        if self.present_ids is not None:
+            df = _new_rows(df, self.present_ids)
+        if df.empty:
+            return 0
+        self.rows += bulk_insert(self.conn, self.stmt, df, self.batch_size)
+        if 'match_id' in df:
+            self.match_ids.update(df['match_id'].tolist())
+        return len(df)
+
+    def finish(self):
+        _save_state(self.conn, self.source, self.table, self.checksum)
+        return self.rows
+
+def load_source(conn, source, file_path, batch_size=BATCH_SIZE, incremental=False, touched=None):
+    table, clean, chunked = LOADERS[source]
+    start = time.perf_counter()
+    checksum = file_checksum(file_path)
+
+    # Whole source runs in one transaction, checksum included
+    with conn.begin():
+        if incremental:
+            state = read_state(conn, source)
+            if state is not None and state.checksum == checksum:
+                print(f"{table.name}: {file_path} unchanged since last ingest, skipping")
+                return _report(table.name, 0, time.perf_counter() - start)
+
+        writer = SourceWriter(conn, source, checksum, batch_size, incremental)
+        raw = pd.read_csv(file_path, chunksize=CHUNK_SIZE) if chunked else [pd.read_csv(file_path)]
+        for chunk in raw:
+            writer.write(clean(chunk))
+        rows = writer.finish()
+    if touched is not None:
+        touched.update(writer.match_ids)
+    return _report(table.name, rows, time.perf_counter() - start)
+
+@contextmanager
+def _tune_sqlite(conn):
+    # Bulk loads can be re-run from the CSVs, so skip fsyncs on the loading
+    # connection only; it goes back to the pool with its setting restored
+    if conn.dialect.name != 'sqlite':
+        yield conn
+        return
+    previous = conn.exec_driver_sql("PRAGMA synchronous").scalar()
+    conn.exec_driver_sql("PRAGMA synchronous=OFF")
+    conn.commit()
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        conn.exec_driver_sql(f"PRAGMA synchronous={int(previous)}")
+        conn.commit()
+
+def load_data(raw_path=RAW_PATH, batch_size=BATCH_SIZE, engine=None, incremental=False):
+    engine = engine or get_engine()
     create_schema(engine)
-    
-    raw_path = "data/raw"
-    
-    with Session(engine) as session:
-        # Load Players
-        print("Loading Players...")
-        df_players = pd.read_csv(os.path.join(raw_path, "ipl_players_info.csv"))
-        for _, row in df_players.iterrows():
-            player = Player(
-                player_id=row['player_id'],
-                name=row['player_name'],
-                batting_style=row['batting_style'],
-                bowling_style=row['bowling_style'],
-                image_url=row['image_url']
-            )
-            session.merge(player) # Use merge to handle duplicates/updates
-        session.commit()
-
-        # Load Matches
-        print("Loading Matches...")
-        df_matches = pd.read_csv(os.path.join(raw_path, "ipl_historical.csv"))
-        # Clean date
-        df_matches['match_date'] = pd.to_datetime(df_matches['match_date'], errors='coerce')
-        
-        for _, row in df_matches.iterrows():
-            match = Match(
-                match_id=row['match_id'],
-                season=row['season'],
-                match_date=row['match_date'],
-                venue_stadium=row['match_venue_stadium'],
-                venue_city=row['match_venue_city'],
-                team1_name=row['team1_name'],
-                team2_name=row['team2_name'],
-                toss_winner=row['toss_winner'],
-                toss_winner_choice=row['toss_winner_choice'],
-                match_winner=row['match_winner'],
-                result_margin=row['match_result_text'],
-                team1_score=row['team1_runs_scored'],
-                team2_score=row['team2_runs_scored']
-            )
-            session.merge(match)
-        session.commit()
-
-        # Load Batting Cards
-        print("Loading Batting Cards...")
-        df_bat = pd.read_csv(os.path.join(raw_path, "ipl_batting_card.csv"))
-        
-        # Handle NaN and types
-        numeric_cols = ['runs', 'balls', 'fours', 'sixes', 'batsman_id', 'strikerate']
-        for col in numeric_cols:
-            df_bat[col] = pd.to_numeric(df_bat[col], errors='coerce').fillna(0)
-            
-        df_bat['batsman_id'] = df_bat['batsman_id'].astype(int)
-        df_bat['runs'] = df_bat['runs'].astype(int)
-        df_bat['balls'] = df_bat['balls'].astype(int)
-        df_bat['fours'] = df_bat['fours'].astype(int)
-        df_bat['sixes'] = df_bat['sixes'].astype(int)
-        
-        # isout might be boolean or string
-        if df_bat['isout'].dtype == 'object':
-             df_bat['isout'] = df_bat['isout'].astype(str).str.lower() == 'true'
-
-        bat_objects = []
-        for _, row in df_bat.iterrows():
-            bat_objects.append(BattingCard(
-                match_id=row['match_id'], # Keep as is, usually int
-                team=row['team'],
-                player_id=row['batsman_id'],
-                runs=row['runs'],
-                balls=row['balls'],
-                fours=row['fours'],
-                sixes=row['sixes'],
-                strike_rate=row['strikerate'],
-                is_out=row['isout'],
-                wicket_type=row['wickettype'] if pd.notna(row['wickettype']) else None
-            ))
-        session.add_all(bat_objects)
-        session.commit()
-        
-        # Load Bowling Cards
-        print("Loading Bowling Cards...")
-        df_bowl = pd.read_csv(os.path.join(raw_path, "ipl_bowling_card.csv"))
-        bowl_objects = []
-        for _, row in df_bowl.iterrows():
-            bowl_objects.append(BowlingCard(
-                match_id=row['match_id'],
-                team=row['team'],
-                player_id=row['bowler_id'],
-                overs=row['overs'],
-                runs_conceded=row['conceded'],
-                wickets=row['wickets'],
-                economy=row['economy']
-            ))
-        session.add_all(bowl_objects)
-        session.commit()
-
-        # Load Ball by Ball (Chunked because it's large)
-        print("Loading Ball by Ball...")
-        chunksize = 10000
-        for chunk in pd.read_csv(os.path.join(raw_path, "ipl_ball_by_ball_data.csv"), chunksize=chunksize):
-            # Clean chunk
-            chunk['batsman_id'] = pd.to_numeric(chunk['batsman_id'], errors='coerce').fillna(0).astype(int)
-            chunk['bowler_id'] = pd.to_numeric(chunk['bowler_id'], errors='coerce').fillna(0).astype(int)
-            chunk['total_runs'] = pd.to_numeric(chunk['total_runs'], errors='coerce').fillna(0).astype(int)
-            chunk['batsman_runs'] = pd.to_numeric(chunk['batsman_runs'], errors='coerce').fillna(0).astype(int)
-            
-            # Handle booleans
-            for col in ['isfour', 'issix', 'iswicket']:
-                if chunk[col].dtype == 'object':
-                     chunk[col] = chunk[col].astype(str).str.lower() == 'true'
-            
-            bbb_objects = []
-            for _, row in chunk.iterrows():
-                bbb_objects.append(BallByBall(
-                    match_id=row['match_id'],
-                    innings_no=row['innings_no'],
-                    over_number=row['over_number'],
-                    ball_number=row['ball_number'],
-                    batsman_id=row['batsman_id'],
-                    bowler_id=row['bowler_id'],
-                    total_runs=row['total_runs'],
-                    batsman_runs=row['batsman_runs'],
-                    is_four=row['isfour'],
-                    is_six=row['issix'],
-                    is_wicket=row['iswicket'],
-                    dismissal_kind=row['dismissal_kind'] if 'dismissal_kind' in row and pd.notna(row['dismissal_kind']) else None
-                ))
-            session.add_all(bbb_objects)
-            session.commit()
-            print(f"Loaded {len(chunk)} balls...")
+
+    stats = {}
+    touched = set()
+    with engine.connect() as conn, _tune_sqlite(conn):
+        for source, filename in SOURCES.items():
+            file_path = os.path.join(raw_path, filename)
+            table = LOADERS[source][0]
+            print(f"Loading {table.name}...")
+            if not os.path.exists(file_path):
+                print(f"Skipping {table.name}: {file_path} not found")
+                continue
+            stats[table.name] = load_source(conn, source, file_path, batch_size, incremental, touched)
+
+        # Derived tables: full rebuild after a reload, only affected players otherwise
+        print("Refreshing aggregates...")
+        with conn.begin():
+            refresh_aggregates(conn, touched if incremental else None)
+            if not incremental or any(s['rows'] for s in stats.values()):
+                print(f"Data version is now {bump_data_version(conn)}")
+    return stats
 
 if __name__ == "__main__":
-    load_data()
+    parser = argparse.ArgumentParser(description="Load raw IPL CSVs into the database")
+    parser.add_argument("--raw-path", default=RAW_PATH)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only load matches not already present in the database")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Parse CSVs in a process pool with a single writer process (0 = sequential)")
+    args = parser.parse_args()
+    if args.workers:
+        from src.etl.pipeline import load_data_parallel
+        load_data_parallel(raw_path=args.raw_path, batch_size=args.batch_size,
+                           incremental=args.incremental, workers=args.workers)
+    else:
+        load_data(raw_path=args.raw_path, batch_size=args.batch_size, incremental=args.incremental)
+    # File-backed indexes served by the API, keyed by the new data version
+    timings = {}
+    with stage('season_index', timings):
+        write_season_index()
+    with stage('ball_store', timings):
+        balls = write_ball_store()
+    with stage('matchups', timings):
+        write_matchups(columns=balls)
+    print(f"Index timings: {format_timings(timings)}")
@@ -0,0 +1,64 @@
+from collections import namedtuple
+from sqlalchemy import select, delete, insert
+from src.etl.schema import Player, PlayerCareerStats, BowlingCareerStats, BattingSeasonStats, BowlingSeasonStats, Leaderboard
+
+ALL_TIME = 0
+LEADERBOARD_SIZE = 100
+
+# Minimum balls faced (batting) or bowled (bowling) to qualify for the rate
+# leaderboards, per season and over a career
+Category = namedtuple('Category', ['kind', 'descending', 'min_balls_season', 'min_balls_all_time'])
+CATEGORIES = {
+    'runs': Category('batting', True, 0, 0),
+    'wickets': Category('bowling', True, 0, 0),
+    'strike_rate': Category('batting', True, 100, 500),
+    'average': Category('batting', True, 100, 500),
+    'economy': Category('bowling', False, 120, 600), # 20 overs a season, 100 overall
+}
+
+def _ranking(category, season):
+    spec = CATEGORIES[category]
+    if spec.kind == 'batting':
+        table = PlayerCareerStats.__table__ if season == ALL_TIME else BattingSeasonStats.__table__
+        appearances = table.c.matches
+    else:
+        table = BowlingCareerStats.__table__ if season == ALL_TIME else BowlingSeasonStats.__table__
+        appearances = table.c.innings
+    if category == 'strike_rate':
+        value = table.c.runs * 100.0 / table.c.balls
+    elif category == 'average':
+        value = table.c.runs * 1.0 / table.c.outs
+    elif category == 'economy':
+        value = table.c.runs_conceded * 6.0 / table.c.balls
+    else:
+        value = table.c[category]
+
+    p = Player.__table__
+    query = select(table.c.player_id, p.c.name, value, appearances).join(p, p.c.player_id == table.c.player_id, isouter=True)
+    if season != ALL_TIME:
+        query = query.where(table.c.season == season)
+    min_balls = spec.min_balls_all_time if season == ALL_TIME else spec.min_balls_season
+    query = query.where(table.c.balls >= max(min_balls, 1))
+    if category == 'average':
+        query = query.where(table.c.outs > 0)
+    order = value.desc() if spec.descending else value.asc()
+    return query.order_by(order, table.c.player_id).limit(LEADERBOARD_SIZE)
+
+def refresh_leaderboards(conn, seasons=None):
+    # Rebuild the top-K rows of the given seasons (and always all time)
+    table = Leaderboard.__table__
+    if seasons is None:
+        conn.execute(delete(table))
+        seasons = conn.execute(select(BattingSeasonStats.season).union(select(BowlingSeasonStats.season))).scalars().all()
+    else:
+        conn.execute(delete(table).where(table.c.season.in_(list(seasons) + [ALL_TIME])))
+    seasons = sorted(set(seasons)) + [ALL_TIME]
+    rows = []
+    for season in seasons:
+        for category in CATEGORIES:
+            for rank, (player_id, name, value, matches) in enumerate(conn.execute(_ranking(category, season)), 1):
+                rows.append({'season': season, 'category': category, 'rank': rank, 'player_id': player_id,
+                             'name': name, 'value': float(value), 'matches': matches})
+    if rows:
+        conn.execute(insert(table), rows)
+    return len(rows)
@@ -0,0 +1,167 @@
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+from sqlalchemy import select
+from src.etl.columnar import bowler_wickets, publish, ball_store
+from src.etl.schema import BallByBall, get_engine
+from src.etl.season_index import data_version_of
+
+MATCHUP_DIR = os.environ.get('IPL_MATCHUP_DIR', 'data/matchups')
+READ_CHUNK = 500000
+METRICS = ['balls', 'runs', 'dismissals', 'dots', 'fours', 'sixes']
+
+def pair_key(batter, bowler):
+    return (np.asarray(batter, dtype=np.int64) << 32) | np.asarray(bowler, dtype=np.int64)
+
+def _swap(keys):
+    return (keys & 0xFFFFFFFF) << 32 | (keys >> 32)
+
+def _reduce(keys, values):
+    # Sum rows sharing a key: returns sorted unique keys and their totals
+    unique, inverse = np.unique(keys, return_inverse=True)
+    totals = np.zeros((len(unique), values.shape[1]), dtype=np.int64)
+    np.add.at(totals, inverse, values)
+    return unique, totals
+
+def _totals(batter, bowler, runs, total_runs, wicket, four, six):
+    known = (batter >= 0) & (bowler >= 0)
+    values = np.column_stack([np.ones(len(batter), dtype=np.int64), runs, wicket, total_runs == 0, four, six])
+    return _reduce(pair_key(batter[known], bowler[known]), values[known].astype(np.int64))
+
+def _chunk_totals(chunk):
+    def ints(name, missing=0):
+        return chunk[name].fillna(missing).to_numpy(dtype=np.int64)
+
+    def flags(name):
+        return chunk[name].fillna(False).astype(bool).to_numpy()
+    return _totals(ints('batsman_id', -1), ints('bowler_id', -1), ints('batsman_runs'), ints('total_runs'),
+                   bowler_wickets(chunk['is_wicket'], chunk['dismissal_kind']).to_numpy(), flags('is_four'),
+                   flags('is_six'))
+
+def _column_totals(store, chunk_size):
+    # Reads only the seven columns it needs from the mapped store, a slice at a time
+    for start in range(0, len(store), chunk_size):
+        rows = slice(start, start + chunk_size)
+        yield _totals(*[np.asarray(store[name][rows], dtype=np.int64) for name in
+                        ['batsman_id', 'bowler_id', 'batsman_runs', 'total_runs', 'bowler_wicket', 'is_four', 'is_six']])
+
+class MatchupStore:
+    # Sparse (batter, bowler) matrix as sorted int64 keys (batter << 32 | bowler)
+    # with one row of METRICS per pair, plus the same pairs keyed and sorted by
+    # bowler first, so "against bowlers" and "against batters" are both slices
+    def __init__(self, keys, stats, bowler_keys, bowler_order, version=None):
+        self.keys = keys
+        self.stats = stats
+        self.bowler_keys = bowler_keys
+        self.bowler_order = bowler_order
+        self.version = version
+
+    @classmethod
+    def from_totals(cls, keys, stats, version=None):
+        bowler_major = _swap(keys)
+        order = np.argsort(bowler_major, kind='stable')
+        return cls(keys, stats.astype(np.int32), bowler_major[order], order, version)
+
+    @classmethod
+    def build(cls, conn, version=None, chunk_size=READ_CHUNK, columns=None):
+        # From the columnar ball store when given, otherwise from ball_by_ball
+        if columns is not None:
+            parts = list(_column_totals(columns, chunk_size))
+        else:
+            import pandas as pd # only needed without the ball store; keeps the API import light
+            b = BallByBall.__table__
+            query = select(b.c.batsman_id, b.c.bowler_id, b.c.batsman_runs, b.c.total_runs,
+                           b.c.is_wicket, b.c.is_four, b.c.is_six, b.c.dismissal_kind)
+            parts = [_chunk_totals(chunk) for chunk in pd.read_sql(query, conn, chunksize=chunk_size)]
+        if not parts:
+            return cls.from_totals(np.empty(0, dtype=np.int64), np.empty((0, len(METRICS)), dtype=np.int64), version)
+        keys, stats = _reduce(np.concatenate([k for k, _ in parts]), np.concatenate([s for _, s in parts]))
+        return cls.from_totals(keys, stats, version)
+
+    def save(self, root):
+        # Each data version gets its own directory, renamed into place when complete
+        os.makedirs(root, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.matchups-', dir=root)
+        # mkdtemp creates 0700; workers running as another user must be able to read it
+        os.chmod(staging, 0o755)
+        np.save(os.path.join(staging, 'keys.npy'), self.keys)
+        np.save(os.path.join(staging, 'stats.npy'), self.stats)
+        np.save(os.path.join(staging, 'bowler_keys.npy'), self.bowler_keys)
+        np.save(os.path.join(staging, 'bowler_order.npy'), self.bowler_order)
+        with open(os.path.join(staging, 'meta.json'), 'w') as f:
+            json.dump({'version': self.version, 'metrics': METRICS, 'pairs': len(self.keys)}, f)
+        return publish(staging, root, self.version)
+
+    @classmethod
+    def load(cls, path):
+        # Memory-mapped: pages are shared between workers and read on demand
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+                  for name in ['keys', 'stats', 'bowler_keys', 'bowler_order']]
+        return cls(*arrays, meta['version'])
+
+    def _row(self, stats):
+        return dict(zip(METRICS, (int(v) for v in stats)))
+
+    def head_to_head(self, batter, bowler):
+        key = int(pair_key(batter, bowler))
+        pos = int(np.searchsorted(self.keys, key))
+        if pos < len(self.keys) and self.keys[pos] == key:
+            return self._row(self.stats[pos])
+        return self._row(np.zeros(len(METRICS)))
+
+    def _slice(self, sorted_keys, player_id):
+        lo = int(np.searchsorted(sorted_keys, int(pair_key(player_id, 0))))
+        hi = int(np.searchsorted(sorted_keys, int(pair_key(player_id + 1, 0))))
+        return lo, hi
+
+    def _ranked(self, rows, opponents, limit, min_balls):
+        stats = np.asarray(self.stats[rows], dtype=np.int64)
+        keep = stats[:, 0] >= min_balls
+        stats, opponents = stats[keep], opponents[keep]
+        # Most dismissals first, then the lowest runs per ball
+        order = np.lexsort((opponents, stats[:, 1] / np.maximum(stats[:, 0], 1), -stats[:, 2]))[:limit]
+        return [dict(player_id=int(opponents[i]), **self._row(stats[i])) for i in order]
+
+    def worst_bowlers(self, batter, limit=10, min_balls=1):
+        lo, hi = self._slice(self.keys, batter)
+        return self._ranked(np.arange(lo, hi), np.asarray(self.keys[lo:hi]) & 0xFFFFFFFF, limit, min_balls)
+
+    def best_victims(self, bowler, limit=10, min_balls=1):
+        lo, hi = self._slice(self.bowler_keys, bowler)
+        return self._ranked(np.asarray(self.bowler_order[lo:hi]), np.asarray(self.bowler_keys[lo:hi]) & 0xFFFFFFFF,
+                            limit, min_balls)
+
+def write_matchups(engine=None, root=MATCHUP_DIR, columns=None):
+    with (engine or get_engine()).connect() as conn:
+        store = MatchupStore.build(conn, data_version_of(conn), columns=columns)
+    path = store.save(root)
+    print(f"Matchup store with {len(store.keys)} batter-bowler pairs written to {path}")
+    return store
+
+class MatchupStoreHolder:
+    # Same contract as the season index: use the files ingest wrote for this
+    # data version, otherwise build from ball_by_ball
+    def __init__(self, root=MATCHUP_DIR):
+        self.root = root
+        self.store = None
+        self.lock = threading.Lock()
+
+    def get(self, version):
+        if self.store is None or self.store.version != version:
+            with self.lock:
+                if self.store is None or self.store.version != version:
+                    self.store = self.build(version)
+        return self.store
+
+    def build(self, version):
+        path = os.path.join(self.root, f"v{version}")
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            return MatchupStore.load(path)
+        with get_engine().connect() as conn:
+            return MatchupStore.build(conn, version, columns=ball_store.get(version))
+
+matchup_store = MatchupStoreHolder()
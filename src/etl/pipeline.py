@@ -0,0 +1,198 @@
+import io
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from queue import Empty, Full
+import pandas as pd
+from src.etl.ingest import (SOURCES, LOADERS, RAW_PATH, BATCH_SIZE, CHUNK_SIZE, SourceWriter,
+                            file_checksum, read_state, _report, _tune_sqlite)
+from src.etl.aggregates import refresh_aggregates, bump_data_version
+from src.etl.schema import get_engine, create_schema
+
+# Files bigger than this are split on line boundaries into several parse tasks
+SPLIT_BYTES = 32 * 1024 * 1024
+QUEUE_SIZE = 8
+
+# How often blocked workers and the parent check whether the writer is still running
+POLL_SECONDS = 0.5
+
+_queue = None
+_abort = None
+
+def _init_worker(queue, abort):
+    global _queue, _abort
+    _queue = queue
+    _abort = abort
+
+def _put(message):
+    # The queue is bounded, so a dead writer would leave this blocked forever
+    while True:
+        try:
+            _queue.put(message, timeout=POLL_SECONDS)
+            return
+        except Full:
+            if _abort.is_set():
+                # Don't wait at exit to flush frames nobody will read
+                _queue.cancel_join_thread()
+                raise RuntimeError("ingest writer stopped, abandoning parse task")
+
+def split_ranges(path, split_bytes=SPLIT_BYTES):
+    # (start, end) byte ranges after the header, each ending on a newline.
+    # Assumes no quoted field spans lines, which holds for the large card files.
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, 'rb') as f:
+        f.readline()
+        start = f.tell()
+        while start < size:
+            f.seek(min(start + split_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def _parse_task(source, path, start=None, end=None):
+    # Runs in a pool worker: read + clean, then hand batches to the writer
+    clean = LOADERS[source][1]
+    if start is None:
+        df = pd.read_csv(path)
+    else:
+        with open(path, 'rb') as f:
+            header = f.readline()
+            f.seek(start)
+            df = pd.read_csv(io.BytesIO(header + f.read(end - start)))
+    cleaned = clean(df)
+
+    frames = 0
+    for offset in range(0, len(cleaned), CHUNK_SIZE):
+        _put(('frame', source, cleaned.iloc[offset:offset + CHUNK_SIZE]))
+        frames += 1
+    return frames
+
+def _writer(queue, results, db_url, sources, batch_size, incremental):
+    # Single process owning the database connection; everything lands in one
+    # transaction so SQLite never sees competing writers
+    engine = get_engine(db_url)
+    try:
+        with engine.connect() as conn, _tune_sqlite(conn), conn.begin():
+            writers = {}
+            timings = {source: 0.0 for source in sources}
+            received, expected = 0, None
+            while expected is None or received < expected:
+                message = queue.get()
+                if message[0] == 'stop':
+                    expected = message[1]
+                    continue
+                _, source, df = message
+                start = time.perf_counter()
+                if source not in writers:
+                    writers[source] = SourceWriter(conn, source, sources[source], batch_size, incremental)
+                writers[source].write(df)
+                timings[source] += time.perf_counter() - start
+                received += 1
+
+            stats = {}
+            for source in sources:
+                start = time.perf_counter()
+                # Sources with no rows still need their table reset / checksum saved
+                writer = writers.get(source) or SourceWriter(conn, source, sources[source], batch_size, incremental)
+                rows = writer.finish()
+                timings[source] += time.perf_counter() - start
+                stats[LOADERS[source][0].name] = _report(LOADERS[source][0].name, rows, timings[source])
+
+            touched = set().union(*(w.match_ids for w in writers.values()))
+            refresh_aggregates(conn, touched if incremental else None)
+            if not incremental or any(s['rows'] for s in stats.values()):
+                print(f"Data version is now {bump_data_version(conn)}")
+        results.put(('ok', stats))
+    except Exception as e:
+        results.put(('error', repr(e)))
+        raise
+
+def _wait_result(results, writer):
+    while True:
+        try:
+            return results.get(timeout=POLL_SECONDS)
+        except Empty:
+            if not writer.is_alive():
+                return ('error', f"writer exited with code {writer.exitcode}")
+
+def _wait_parsed(futures, writer, abort):
+    # Wait for the parse tasks, watching the writer: if it dies, tell the
+    # workers to stop and cancel what has not started. Returns the frame count,
+    # or None when the writer is gone.
+    pending = set(futures)
+    while pending:
+        _, pending = wait(pending, timeout=POLL_SECONDS)
+        if pending and not writer.is_alive():
+            abort.set()
+            for future in pending:
+                future.cancel()
+            return None
+    return sum(future.result() for future in futures)
+
+def load_data_parallel(raw_path=RAW_PATH, batch_size=BATCH_SIZE, engine=None, incremental=False,
+                       workers=None, queue_size=QUEUE_SIZE, split_bytes=SPLIT_BYTES):
+    engine = engine or get_engine()
+    create_schema(engine)
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+
+    # Decide which sources need work before starting any process
+    sources = {}
+    with engine.connect() as conn:
+        for source, filename in SOURCES.items():
+            file_path = os.path.join(raw_path, filename)
+            if not os.path.exists(file_path):
+                print(f"Skipping {LOADERS[source][0].name}: {file_path} not found")
+                continue
+            checksum = file_checksum(file_path)
+            state = read_state(conn, source) if incremental else None
+            if state is not None and state.checksum == checksum:
+                print(f"{LOADERS[source][0].name}: {file_path} unchanged since last ingest, skipping")
+                continue
+            sources[source] = checksum
+    if not sources:
+        return {}
+
+    queue = mp.Queue(maxsize=queue_size)
+    results = mp.Queue()
+    abort = mp.Event()
+    db_url = engine.url.render_as_string(hide_password=False)
+    writer = mp.Process(target=_writer, args=(queue, results, db_url, sources, batch_size, incremental))
+    writer.start()
+
+    tasks = []
+    for source in sources:
+        file_path = os.path.join(raw_path, SOURCES[source])
+        if os.path.getsize(file_path) > split_bytes:
+            tasks.extend((source, file_path, s, e) for s, e in split_ranges(file_path, split_bytes))
+        else:
+            tasks.append((source, file_path))
+
+    print(f"Parsing {len(tasks)} tasks on {workers} workers...")
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(queue, abort)) as pool:
+            futures = [pool.submit(_parse_task, *task) for task in tasks]
+            frames = _wait_parsed(futures, writer, abort)
+    except BaseException:
+        writer.terminate()
+        writer.join()
+        raise
+    while frames is not None and writer.is_alive():
+        try:
+            queue.put(('stop', frames), timeout=POLL_SECONDS)
+            break
+        except Full:
+            pass
+    status, payload = _wait_result(results, writer)
+    writer.join()
+
+    if status != 'ok':
+        raise RuntimeError(f"Ingest writer failed: {payload}")
+    elapsed = time.perf_counter() - start
+    rows = sum(s['rows'] for s in payload.values())
+    print(f"Pipeline loaded {rows} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)")
+    return payload
@@ -1,13 +1,26 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, ForeignKey, Boolean, BigInteger
+import os
+import threading
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean, BigInteger, Index, inspect
 from sqlalchemy.orm import declarative_base, relationship
 
+DEFAULT_DB_URL = 'sqlite:///data/ipl.db'
+
+# Applied to every new SQLite connection
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000, # negative = KiB, so 64MB
+    'temp_store': 'MEMORY',
+}
+
 Base = declarative_base()
 
 class Match(Base):
     __tablename__ = 'matches'
     
     match_id = Column(Integer, primary_key=True)
-    season = Column(Integer)
+    season = Column(Integer, index=True)
     match_date = Column(Date)
     venue_stadium = Column(String)
     venue_city = Column(String)
@@ -35,7 +48,7 @@ class BallByBall(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     match_id = Column(Integer, ForeignKey('matches.match_id'), index=True)
     innings_no = Column(Integer)
-    over_number = Column(Integer)
+    over_number = Column(Integer) # 1-20, as on a scorecard
     ball_number = Column(Integer)
     batsman_id = Column(Integer, ForeignKey('players.player_id'))
     bowler_id = Column(Integer, ForeignKey('players.player_id'))
@@ -51,11 +64,17 @@ class BallByBall(Base):
     batsman = relationship("Player", foreign_keys=[batsman_id])
     bowler = relationship("Player", foreign_keys=[bowler_id])
 
+    __table_args__ = (
+        Index('ix_ball_by_ball_batsman_bowler', 'batsman_id', 'bowler_id'),
+        Index('ix_ball_by_ball_bowler_batsman', 'bowler_id', 'batsman_id'),
+    )
+
 class BattingCard(Base):
     __tablename__ = 'batting_cards'
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     match_id = Column(Integer, ForeignKey('matches.match_id'))
+    innings = Column(Integer)
     team = Column(String)
     player_id = Column(Integer, ForeignKey('players.player_id'))
     runs = Column(Integer)
@@ -66,11 +85,18 @@ class BattingCard(Base):
     is_out = Column(Boolean)
     wicket_type = Column(String)
 
+    __table_args__ = (
+        # Natural key used by incremental ingest upserts
+        Index('ux_batting_cards_match_innings_player', 'match_id', 'innings', 'player_id', unique=True),
+        Index('ix_batting_cards_player_match', 'player_id', 'match_id'),
+    )
+
 class BowlingCard(Base):
     __tablename__ = 'bowling_cards'
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     match_id = Column(Integer, ForeignKey('matches.match_id'))
+    innings = Column(Integer)
     team = Column(String)
     player_id = Column(Integer, ForeignKey('players.player_id'))
     overs = Column(Float)
@@ -78,8 +104,224 @@ class BowlingCard(Base):
     wickets = Column(Integer)
     economy = Column(Float)
 
-def get_engine(db_path='sqlite:///data/ipl.db'):
-    return create_engine(db_path)
+    __table_args__ = (
+        Index('ux_bowling_cards_match_innings_player', 'match_id', 'innings', 'player_id', unique=True),
+        Index('ix_bowling_cards_player_match', 'player_id', 'match_id'),
+    )
+
+class Partnership(Base):
+    __tablename__ = 'partnerships'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    match_id = Column(Integer, ForeignKey('matches.match_id'))
+    innings = Column(Integer)
+    wicket = Column(Integer) # the stand for this wicket
+    team = Column(String)
+    opposition = Column(String)
+    player1_id = Column(Integer, ForeignKey('players.player_id'))
+    player2_id = Column(Integer, ForeignKey('players.player_id'))
+    player1_runs = Column(Integer)
+    player2_runs = Column(Integer)
+    player1_balls = Column(Integer)
+    player2_balls = Column(Integer)
+    runs = Column(Integer)
+    balls = Column(Integer)
+
+    __table_args__ = (
+        Index('ux_partnerships_match_innings_wicket', 'match_id', 'innings', 'wicket', unique=True),
+    )
+
+class FallOfWicket(Base):
+    __tablename__ = 'fall_of_wickets'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    match_id = Column(Integer, ForeignKey('matches.match_id'))
+    innings = Column(Integer)
+    team = Column(String)
+    player_id = Column(Integer, ForeignKey('players.player_id'))
+    wicket = Column(Integer)
+    overs = Column(Float)
+    runs = Column(Integer) # team score when the wicket fell
+
+    __table_args__ = (
+        Index('ux_fall_of_wickets_match_innings_wicket', 'match_id', 'innings', 'wicket', unique=True),
+    )
+
+class PlayerCareerStats(Base):
+    __tablename__ = 'player_career_stats'
+
+    # Batting career totals, rebuilt at the end of ingest
+    player_id = Column(Integer, primary_key=True)
+    matches = Column(Integer)
+    runs = Column(Integer)
+    balls = Column(Integer)
+    outs = Column(Integer)
+    fours = Column(Integer)
+    sixes = Column(Integer)
+    hundreds = Column(Integer)
+    fifties = Column(Integer)
+    highest = Column(Integer)
+
+class BowlingCareerStats(Base):
+    __tablename__ = 'bowling_career_stats'
+
+    player_id = Column(Integer, primary_key=True)
+    innings = Column(Integer)
+    balls = Column(Integer)
+    runs_conceded = Column(Integer)
+    wickets = Column(Integer)
+    four_wickets = Column(Integer)
+
+class BattingSeasonStats(Base):
+    __tablename__ = 'batting_season_stats'
+
+    # Per-season batting totals behind the leaderboards and season-range stats
+    player_id = Column(Integer, primary_key=True)
+    season = Column(Integer, primary_key=True)
+    matches = Column(Integer)
+    runs = Column(Integer)
+    balls = Column(Integer)
+    outs = Column(Integer)
+    hundreds = Column(Integer)
+    fifties = Column(Integer)
+
+class BowlingSeasonStats(Base):
+    __tablename__ = 'bowling_season_stats'
+
+    player_id = Column(Integer, primary_key=True)
+    season = Column(Integer, primary_key=True)
+    innings = Column(Integer)
+    balls = Column(Integer)
+    runs_conceded = Column(Integer)
+    wickets = Column(Integer)
+    four_wickets = Column(Integer)
+
+class Leaderboard(Base):
+    __tablename__ = 'leaderboards'
+
+    # Top-K ranking per (season, category); season 0 is all time
+    season = Column(Integer, primary_key=True)
+    category = Column(String, primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    player_id = Column(Integer)
+    name = Column(String)
+    value = Column(Float)
+    matches = Column(Integer)
+
+class PartnershipPairStats(Base):
+    __tablename__ = 'partnership_pair_stats'
+
+    # Every stand of a pair, keyed with the lower player id first
+    player_a = Column(Integer, primary_key=True)
+    player_b = Column(Integer, primary_key=True)
+    stands = Column(Integer)
+    runs = Column(Integer)
+    balls = Column(Integer)
+    best = Column(Integer)
+
+    __table_args__ = (
+        Index('ix_partnership_pair_stats_player_b', 'player_b'),
+    )
+
+class TeamWicketStats(Base):
+    __tablename__ = 'team_wicket_stats'
+
+    # How each team's wickets fall: how often wicket N went down within
+    # COLLAPSE_RUNS of wicket N-1
+    team = Column(String, primary_key=True)
+    wicket = Column(Integer, primary_key=True)
+    falls = Column(Integer)
+    collapses = Column(Integer)
+    runs_added = Column(Integer)
+
+class FeatureState(Base):
+    __tablename__ = 'feature_state'
+
+    # Online rolling-feature state (see src/ml/feature_store.py).
+    # kind is 'team', 'venue', 'global' or 'watermark'.
+    kind = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    runs_sum = Column(Float)
+    count = Column(Integer)
+    window = Column(String) # JSON list of the last runs, oldest first
+    match_date = Column(Date)
+    match_id = Column(Integer)
+
+class DataVersion(Base):
+    __tablename__ = 'data_version'
+
+    # Single row bumped by every ingest that changes data; API caches key on it
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer)
+    updated_at = Column(DateTime)
+
+class IngestState(Base):
+    __tablename__ = 'ingest_state'
+
+    # One row per raw source file; an unchanged checksum lets incremental
+    # ingest skip the file
+    source = Column(String, primary_key=True)
+    checksum = Column(String)
+    row_count = Column(Integer)
+    updated_at = Column(DateTime)
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+def database_url():
+    return os.environ.get('IPL_DATABASE_URL', DEFAULT_DB_URL)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def get_engine(db_path=None):
+    # One engine (and connection pool) per URL for the whole process
+    url = db_path or database_url()
+    engine = _engines.get(url)
+    if engine is not None:
+        return engine
+    with _engines_lock:
+        if url not in _engines:
+            kwargs = {}
+            if url not in ('sqlite://', 'sqlite:///:memory:'):
+                kwargs = {
+                    'pool_size': int(os.environ.get('IPL_DB_POOL_SIZE', 10)),
+                    'max_overflow': int(os.environ.get('IPL_DB_MAX_OVERFLOW', 20)),
+                    'pool_pre_ping': not url.startswith('sqlite'),
+                }
+            engine = create_engine(url, **kwargs)
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', _set_sqlite_pragmas)
+            _engines[url] = engine
+        return _engines[url]
+
+def _dispose_after_fork():
+    # A forked child must not reuse the parent's pooled connections; drop
+    # them without closing so the parent's stay usable
+    for engine in list(_engines.values()):
+        engine.dispose(close=False)
+
+# Unix only; without fork there is nothing to inherit
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dispose_after_fork)
 
 def create_schema(engine):
     Base.metadata.create_all(engine)
+    migrate_schema(engine)
+
+def migrate_schema(engine):
+    # create_all only creates missing tables; add columns and indexes
+    # introduced after a database was first created
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {col['name'] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}')
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
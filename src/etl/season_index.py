@@ -0,0 +1,113 @@
+import os
+import threading
+import numpy as np
+from sqlalchemy import select, func
+from src.etl.schema import BattingSeasonStats, BowlingSeasonStats, DataVersion, get_engine
+
+SEASON_INDEX_PATH = os.environ.get('IPL_SEASON_INDEX', 'data/season_index.npz')
+BATTING_METRICS = ['matches', 'runs', 'balls', 'outs', 'hundreds', 'fifties']
+BOWLING_METRICS = ['innings', 'balls', 'runs_conceded', 'wickets', 'four_wickets']
+
+def _prefix_sums(rows, seasons, n_metrics):
+    # rows: (player_id, season, *metrics). Returns the sorted player ids and
+    # totals[p, s] = sum over the first s seasons, so totals[:, 0] is zero.
+    rows = np.asarray(rows, dtype=np.int64).reshape(-1, n_metrics + 2)
+    players = np.unique(rows[:, 0])
+    totals = np.zeros((len(players), len(seasons) + 1, n_metrics), dtype=np.int32)
+    np.add.at(totals, (np.searchsorted(players, rows[:, 0]), np.searchsorted(seasons, rows[:, 1]) + 1), rows[:, 2:])
+    np.cumsum(totals, axis=1, out=totals)
+    return players, totals
+
+class SeasonIndex:
+    # Per-player cumulative season totals for batting and bowling; any
+    # from/to season range is answered by subtracting two rows
+    def __init__(self, seasons, batting_players, batting, bowling_players, bowling, version=None):
+        self.seasons = seasons
+        self.batting_players = batting_players
+        self.batting_totals = batting
+        self.bowling_players = bowling_players
+        self.bowling_totals = bowling
+        self.version = version
+        self._batting_pos = {pid: i for i, pid in enumerate(batting_players.tolist())}
+        self._bowling_pos = {pid: i for i, pid in enumerate(bowling_players.tolist())}
+
+    @classmethod
+    def build(cls, conn, version=None):
+        bat, bowl = BattingSeasonStats.__table__, BowlingSeasonStats.__table__
+        batting = conn.execute(select(bat.c.player_id, bat.c.season, *[func.coalesce(bat.c[m], 0) for m in BATTING_METRICS])).fetchall()
+        bowling = conn.execute(select(bowl.c.player_id, bowl.c.season, *[func.coalesce(bowl.c[m], 0) for m in BOWLING_METRICS])).fetchall()
+        seasons = np.unique(np.array([r[1] for r in batting] + [r[1] for r in bowling], dtype=np.int32))
+        batting_players, batting_totals = _prefix_sums(batting, seasons, len(BATTING_METRICS))
+        bowling_players, bowling_totals = _prefix_sums(bowling, seasons, len(BOWLING_METRICS))
+        return cls(seasons, batting_players, batting_totals, bowling_players, bowling_totals, version)
+
+    def save(self, path):
+        # Written to a temp file and renamed so readers never see a partial index
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as f:
+            np.savez(f, seasons=self.seasons, batting_players=self.batting_players, batting=self.batting_totals,
+                     bowling_players=self.bowling_players, bowling=self.bowling_totals,
+                     version=np.int64(-1 if self.version is None else self.version))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            version = int(data['version'])
+            return cls(data['seasons'], data['batting_players'], data['batting'], data['bowling_players'],
+                       data['bowling'], None if version < 0 else version)
+
+    def _bounds(self, from_season, to_season):
+        lo = 0 if from_season is None else int(np.searchsorted(self.seasons, from_season, side='left'))
+        hi = len(self.seasons) if to_season is None else int(np.searchsorted(self.seasons, to_season, side='right'))
+        return lo, max(lo, hi)
+
+    def _range(self, positions, totals, metrics, player_id, from_season, to_season):
+        pos = positions.get(player_id)
+        if pos is None:
+            return None
+        lo, hi = self._bounds(from_season, to_season)
+        return dict(zip(metrics, (totals[pos, hi] - totals[pos, lo]).tolist()))
+
+    def batting(self, player_id, from_season=None, to_season=None):
+        return self._range(self._batting_pos, self.batting_totals, BATTING_METRICS, player_id, from_season, to_season)
+
+    def bowling(self, player_id, from_season=None, to_season=None):
+        return self._range(self._bowling_pos, self.bowling_totals, BOWLING_METRICS, player_id, from_season, to_season)
+
+def data_version_of(conn):
+    return conn.execute(select(DataVersion.version).where(DataVersion.id == 1)).scalar() or 0
+
+def write_season_index(engine=None, path=SEASON_INDEX_PATH):
+    with (engine or get_engine()).connect() as conn:
+        index = SeasonIndex.build(conn, data_version_of(conn))
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    index.save(path)
+    print(f"Season index for {len(index.batting_players)} batters, {len(index.bowling_players)} bowlers "
+          f"over {len(index.seasons)} seasons written to {path}")
+    return index
+
+class SeasonIndexHolder:
+    # Serves the index written by ingest, rebuilding from the season tables
+    # when the file is missing or behind the database's data version
+    def __init__(self, path=SEASON_INDEX_PATH):
+        self.path = path
+        self.index = None
+        self.lock = threading.Lock()
+
+    def get(self, version):
+        if self.index is None or self.index.version != version:
+            with self.lock:
+                if self.index is None or self.index.version != version:
+                    self.index = self.build(version)
+        return self.index
+
+    def build(self, version):
+        if os.path.exists(self.path):
+            index = SeasonIndex.load(self.path)
+            if index.version == version:
+                return index
+        with get_engine().connect() as conn:
+            return SeasonIndex.build(conn, version)
+
+season_index = SeasonIndexHolder()
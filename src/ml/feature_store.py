@@ -0,0 +1,143 @@
+import json
+from collections import deque
+import pandas as pd
+from sqlalchemy import and_, delete, insert, or_, select, text
+from src.etl.schema import FeatureState, Match
+from src.ml.features import INNINGS_QUERY, to_innings
+
+WINDOW = 5
+ROLLING_FEATURES = ['team_avg_runs_5', 'team_avg_runs_all', 'venue_avg_runs']
+
+class RunningMean:
+    # Expanding mean, optionally with a last-N ring buffer for a windowed mean
+    def __init__(self, window=None, runs_sum=0.0, count=0, last=()):
+        self.runs_sum = runs_sum
+        self.count = count
+        self.last = deque(last, maxlen=window) if window else None
+        self.window_sum = float(sum(self.last)) if self.last is not None else 0.0
+
+    def add(self, runs):
+        self.runs_sum += runs
+        self.count += 1
+        if self.last is not None:
+            if len(self.last) == self.last.maxlen:
+                self.window_sum -= self.last[0]
+            self.last.append(runs)
+            self.window_sum += runs
+
+    def mean(self):
+        return self.runs_sum / self.count if self.count else None
+
+    def window_mean(self):
+        return self.window_sum / len(self.last) if self.last else None
+
+class FeatureStore:
+    # Same definitions as calculate_rolling_features, kept as running state so
+    # serving reads exact features in O(1) and ingest applies new innings in O(1) each
+    def __init__(self):
+        self.teams = {}
+        self.venues = {}
+        self.overall = RunningMean()
+        self.watermark = None # (match_date, match_id) of the last innings applied
+
+    def add(self, team, venue, runs):
+        self.teams.setdefault(team, RunningMean(WINDOW)).add(runs)
+        self.venues.setdefault(venue, RunningMean()).add(runs)
+        self.overall.add(runs)
+
+    def features(self, team, venue):
+        # Unseen teams/venues fall back to the global average like training does
+        fill = self.overall.mean()
+        team_state = self.teams.get(team)
+        venue_state = self.venues.get(venue)
+        values = {
+            'team_avg_runs_5': team_state.window_mean() if team_state else None,
+            'team_avg_runs_all': team_state.mean() if team_state else None,
+            'venue_avg_runs': venue_state.mean() if venue_state else None,
+        }
+        return {name: fill if value is None else value for name, value in values.items()}
+
+    def apply(self, innings):
+        # innings: rows from to_innings(), already in replay order
+        for row in innings.itertuples(index=False):
+            self.add(row.team, row.venue, float(row.runs))
+            self.watermark = (row.match_date.date(), int(row.match_id))
+
+    def replay(self, innings):
+        # Point-in-time features for each row (before it is applied); used to
+        # check training/serving parity. Unlike training, the fill value here is
+        # the global mean so far rather than over the whole dataset.
+        rows = []
+        for row in innings.itertuples(index=False):
+            team_state = self.teams.get(row.team)
+            venue_state = self.venues.get(row.venue)
+            rows.append((team_state.window_mean() if team_state else None,
+                         team_state.mean() if team_state else None,
+                         venue_state.mean() if venue_state else None))
+            self.add(row.team, row.venue, float(row.runs))
+            self.watermark = (row.match_date.date(), int(row.match_id))
+        return pd.DataFrame(rows, columns=ROLLING_FEATURES, index=innings.index, dtype=float)
+
+    @classmethod
+    def from_history(cls, innings):
+        store = cls()
+        store.apply(innings)
+        return store
+
+    def save(self, conn):
+        table = FeatureState.__table__
+        rows = [{'kind': 'team', 'key': team, 'runs_sum': s.runs_sum, 'count': s.count,
+                 'window': json.dumps(list(s.last))} for team, s in self.teams.items()]
+        rows += [{'kind': 'venue', 'key': venue, 'runs_sum': s.runs_sum, 'count': s.count}
+                 for venue, s in self.venues.items()]
+        rows.append({'kind': 'global', 'key': '', 'runs_sum': self.overall.runs_sum, 'count': self.overall.count})
+        if self.watermark:
+            rows.append({'kind': 'watermark', 'key': '', 'match_date': self.watermark[0], 'match_id': self.watermark[1]})
+        conn.execute(delete(table))
+        for row in rows:
+            row.setdefault('window', None)
+            for col in ['runs_sum', 'count', 'match_date', 'match_id']:
+                row.setdefault(col, None)
+        conn.execute(insert(table), rows)
+
+    @classmethod
+    def load(cls, conn):
+        store = cls()
+        for row in conn.execute(select(FeatureState.__table__)):
+            if row.kind == 'team':
+                store.teams[row.key] = RunningMean(WINDOW, row.runs_sum, row.count, json.loads(row.window or '[]'))
+            elif row.kind == 'venue':
+                store.venues[row.key] = RunningMean(None, row.runs_sum, row.count)
+            elif row.kind == 'global':
+                store.overall = RunningMean(None, row.runs_sum, row.count)
+            elif row.kind == 'watermark':
+                store.watermark = (row.match_date, row.match_id)
+        return store
+
+def _backfilled(conn, watermark, match_ids):
+    # Were any of the loaded matches played at or before the watermark? Those
+    # belong in the middle of the replay, so they cannot just be appended.
+    d, m = watermark
+    older = or_(Match.match_date < d, and_(Match.match_date == d, Match.match_id <= m))
+    ids = list(match_ids)
+    return any(conn.execute(select(Match.match_id).where(Match.match_id.in_(ids[i:i + 500]), older).limit(1)).first()
+               for i in range(0, len(ids), 500))
+
+def update_feature_store(conn, rebuild=False, match_ids=None):
+    # Called at the end of ingest: apply only innings after the watermark, or
+    # replay everything (about 2k innings) when ingest backfilled older matches
+    store = FeatureStore() if rebuild else FeatureStore.load(conn)
+    if not rebuild and store.watermark and match_ids and _backfilled(conn, store.watermark, match_ids):
+        store, rebuild = FeatureStore(), True
+    query = INNINGS_QUERY
+    params = {}
+    if store.watermark:
+        query += " AND (m.match_date > :d OR (m.match_date = :d AND m.match_id > :m))"
+        params = {'d': store.watermark[0], 'm': store.watermark[1]}
+    new = pd.read_sql(text(query + " ORDER BY m.match_date"), conn, params=params)
+    if new.empty and not rebuild:
+        return 0
+    innings = to_innings(new)
+    store.apply(innings)
+    store.save(conn)
+    return len(innings)
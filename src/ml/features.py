@@ -1,12 +1,9 @@
+from collections import namedtuple
 import pandas as pd
 import numpy as np
 from src.etl.schema import get_engine
 
-def load_training_data():
-    engine = get_engine()
-    
-    # We need match details to calculate features
-    query = """
+INNINGS_QUERY = """
     SELECT 
         m.match_id,
         m.season,
@@ -20,11 +17,9 @@ def load_training_data():
         m.team2_score
     FROM matches m
     WHERE m.team1_score > 0 AND m.team2_score > 0
-    ORDER BY m.match_date
-    """
-    
-    df = pd.read_sql(query, engine)
-    
+"""
+
+def to_innings(df):
     # Restructure into innings level (Target: Runs)
     # We want to predict runs for a specific team in a specific match
     
@@ -38,44 +33,98 @@ def load_training_data():
     
     data = pd.concat([innings1, innings2], ignore_index=True)
     data['match_date'] = pd.to_datetime(data['match_date'])
-    data = data.sort_values(['match_date', 'match_id'])
+    # Stable sort: first innings before second within a match, so the online
+    # feature store replays history in exactly this order
+    data = data.sort_values(['match_date', 'match_id'], kind='stable')
     
     return data
 
-def calculate_rolling_features(data):
-    # Team Rolling Avg Runs (Last 5 games)
-    data['team_avg_runs_5'] = data.groupby('team')['runs'].transform(lambda x: x.shift(1).rolling(window=5, min_periods=1).mean())
+def load_training_data(engine=None):
+    engine = engine or get_engine()
     
-    # Team Avg Runs (All time before this match)
-    data['team_avg_runs_all'] = data.groupby('team')['runs'].transform(lambda x: x.shift(1).expanding().mean())
+    # We need match details to calculate features
+    df = pd.read_sql(INNINGS_QUERY + " ORDER BY m.match_date", engine)
+    return to_innings(df)
 
-    # Venue Avg Runs (All time before this match)
-    data['venue_avg_runs'] = data.groupby('venue')['runs'].transform(lambda x: x.shift(1).expanding().mean())
-    
-    # Opposition Runs Conceded Avg? (Maybe too complex for now, stick to simple features)
+# Declarative rolling features: mean of `value` over earlier rows of the same
+# `by` group, over the last `window` rows or all of them (window=None).
+RollingSpec = namedtuple('RollingSpec', ['name', 'by', 'value', 'window'])
+
+ROLLING_SPECS = [
+    RollingSpec('team_avg_runs_5', 'team', 'runs', 5),     # Team Rolling Avg Runs (Last 5 games)
+    RollingSpec('team_avg_runs_all', 'team', 'runs', None), # Team Avg Runs (All time before this match)
+    RollingSpec('venue_avg_runs', 'venue', 'runs', None),   # Venue Avg Runs (All time before this match)
+]
+
+def group_layout(keys):
+    # Stable sort by group code: rows of each group become contiguous, in their
+    # original order. Shared by every feature grouped on the same column.
+    codes, _ = pd.factorize(keys)
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    idx = np.arange(len(codes))
+    is_start = np.ones(len(codes), dtype=bool)
+    is_start[1:] = sorted_codes[1:] != sorted_codes[:-1]
+    position = idx - np.maximum.accumulate(np.where(is_start, idx, 0))
+    return order, position, sorted_codes < 0
+
+def prior_mean(data, by, value, window=None, layout=None):
+    # Vectorized equivalent of groupby(by)[value].transform(lambda x: x.shift(1).rolling(window).mean())
+    # (or .expanding() when window is None). With an exclusive cumsum over the
+    # group-sorted values, the sum of the previous k rows of a group is a
+    # difference of two cumsum entries, so every row is O(1). NaN values are
+    # left out of both the sums and the counts, as pandas skips them.
+    order, position, missing = layout if layout is not None else group_layout(data[by])
+    values = data[value].to_numpy(dtype=float)[order]
+    present = ~np.isnan(values)
+    values = np.where(present, values, 0.0)
+    exclusive = np.cumsum(values) - values
+    counts = np.cumsum(present) - present
+    back = position if window is None else np.minimum(position, window)
+    idx = np.arange(len(values))
+    seen = counts - counts[idx - back]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = (exclusive - exclusive[idx - back]) / seen
+    means[(seen == 0) | missing] = np.nan
+
+    result = np.empty(len(values))
+    result[order] = means
+    return pd.Series(result, index=data.index)
+
+def calculate_rolling_features(data, specs=ROLLING_SPECS):
+    layouts = {}
+    for spec in specs:
+        if spec.by not in layouts:
+            layouts[spec.by] = group_layout(data[spec.by])
+        data[spec.name] = prior_mean(data, spec.by, spec.value, spec.window, layouts[spec.by])
     
     # Fill NA (first matches) with global average
     global_avg = data['runs'].mean()
-    data.fillna(global_avg, inplace=True)
+    for col in data.columns:
+        if data[col].hasnans:
+            data[col] = data[col].fillna(global_avg)
     
     return data
 
-def prepare_features(data):
-    # Encode categoricals using codes
-    # Note: In production, we need to save the encoding mapping. 
-    # For this assignment, we will use pandas category codes and assume reliable mapping if data is static.
-    # A better way for production is to use sklearn OrdinalEncoder and save it.
-    
+CATEGORICAL_COLS = ['venue', 'team', 'opposition', 'toss_winner', 'toss_choice']
+FEATURES = ['season', 'venue', 'team', 'opposition', 'toss_winner', 'toss_choice', 'innings',
+            'team_avg_runs_5', 'team_avg_runs_all', 'venue_avg_runs']
+
+def fit_encoders(data):
+    # Same codes as astype('category').cat.codes (sorted categories), kept as
+    # plain dicts so they can be saved next to the model and used at serving time
+    return {col: {str(cat): code for code, cat in enumerate(sorted(data[col].dropna().astype(str).unique()))}
+            for col in CATEGORICAL_COLS}
+
+def prepare_features(data, encoders=None):
+    # Encode categoricals using codes. Pass the encoders fitted on the full
+    # dataset so train/test (and serving) share one mapping; unseen values become NaN.
     data = data.copy()
-    
-    # Convert to category type first to ensure consistent encoding if we control categories
-    # But here we just use what's in the data
-    cat_cols = ['venue', 'team', 'opposition', 'toss_winner', 'toss_choice']
-    for col in cat_cols:
-        data[col] = data[col].astype('category').cat.codes
-        
-    features = ['season', 'venue', 'team', 'opposition', 'toss_winner', 'toss_choice', 'innings', 
-                'team_avg_runs_5', 'team_avg_runs_all', 'venue_avg_runs']
+    if encoders is None:
+        encoders = fit_encoders(data)
+
+    for col in CATEGORICAL_COLS:
+        data[col] = data[col].astype(str).map(encoders[col]).astype(float)
+
     target = 'runs'
-    
-    return data[features], data[target]
+    return data[FEATURES], data[target]
@@ -1,65 +1,170 @@
-import joblib
-import pandas as pd
 import os
+import threading
+import time
+import pandas as pd
 import numpy as np
+from src.etl.schema import get_engine
+from src.ml.features import FEATURES, CATEGORICAL_COLS as CATEGORICAL
+from src.ml.feature_store import FeatureStore, ROLLING_FEATURES
+from src.ml.registry import ModelRegistry, REGISTRY_PATH
+from src.observability.metrics import REGISTRY
+
+# Only used when the feature store has not been built yet
+DEFAULT_ROLLING = {'team_avg_runs_5': 160, 'team_avg_runs_all': 155, 'venue_avg_runs': 165}
+# How often the serving process checks the registry for a newly promoted model
+MODEL_POLL_SECONDS = float(os.environ.get('IPL_MODEL_POLL_SECONDS', 5.0))
+
+MODEL_LOAD_SECONDS = REGISTRY.histogram('ipl_model_load_seconds', 'Time to load a model version from the registry',
+                                        buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+PREDICT_SECONDS = REGISTRY.histogram('ipl_predict_seconds', 'Model prediction time', ['kind'],
+                                     buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.1))
 
 class Predictor:
-    def __init__(self, model_path="src/ml/artifacts/model.pkl"):
-        self.model_path = model_path
-        self.model = None
-        
+    def __init__(self, registry_path=REGISTRY_PATH):
+        self.registry = ModelRegistry(registry_path)
+        # Current LoadedModel. Each request reads it once, so a swap never
+        # mixes two models' encoders and trees within one prediction.
+        self.current = None
+        self.feature_store = None
+        self.features_version = None
+        self._column = {name: i for i, name in enumerate(FEATURES)}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+
+    @property
+    def model_version(self):
+        current = self.current
+        return current.version if current is not None else None
+
+    @property
+    def encoders(self):
+        current = self.current
+        return current.encoders if current is not None else {}
+
     def load_model(self):
-        if not self.model:
-            if os.path.exists(self.model_path):
-                self.model = joblib.load(self.model_path)
+        if self.current is not None:
+            return self.current
+        with self._lock:
+            if self.current is None:
+                with MODEL_LOAD_SECONDS.time():
+                    self.current = self.registry.load()
+        # Standalone use still gets rolling features; the API syncs them to
+        # the data version itself, so don't reload a store it already has
+        if self.feature_store is None:
+            self.sync_features()
+        return self.current
+
+    def refresh_model(self):
+        # Load a newly promoted version off to the side, then swap the reference;
+        # in-flight requests finish on the snapshot they already hold
+        version = self.registry.active_version()
+        if version is None or version == self.model_version:
+            return False
+        with self._lock:
+            if version == self.model_version:
+                return False
+            with MODEL_LOAD_SECONDS.time():
+                loaded = self.registry.load(version)
+            previous = self.model_version
+            self.current = loaded
+        print(f"Model swapped {previous} -> {loaded.version}")
+        return True
+
+    def start_watcher(self, interval=MODEL_POLL_SECONDS):
+        if self._watcher is not None or interval <= 0:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh_model()
+            except Exception as e:
+                # Keep serving the current model if the new one can't be read
+                print(f"Model refresh failed: {e}")
+
+    def sync_features(self, version=None):
+        # Reload the online feature store when ingest has moved the data on
+        if self.feature_store is not None and version == self.features_version:
+            return
+        try:
+            with get_engine().connect() as conn:
+                store = FeatureStore.load(conn)
+        except Exception as e:
+            print(f"Feature store not available, using defaults: {e}")
+            store = FeatureStore()
+        self.feature_store = store
+        self.features_version = version
+
+    def rolling_features(self, team, venue):
+        if self.feature_store is None or not self.feature_store.overall.count:
+            return DEFAULT_ROLLING
+        return self.feature_store.features(team, venue)
+
+    def _buffer(self):
+        # One preallocated feature row per thread; requests run in a threadpool
+        buf = getattr(self._local, 'buf', None)
+        if buf is None:
+            buf = self._local.buf = np.empty((1, len(FEATURES)), dtype=np.float32)
+        return buf
+
+    def predict(self, season, venue, team, opposition, toss_winner, toss_choice, innings, model=None):
+        # Callers that report the version pass the snapshot they read it from
+        model = model or self.load_model()
+        start = time.perf_counter()
+
+        # Fast path: fill a reused float32 row and call the booster directly,
+        # skipping DataFrame construction and the sklearn wrapper
+        buf = self._buffer()
+        col = self._column
+        buf[0, col['season']] = season
+        buf[0, col['venue']] = self._encode('venue', venue, model)
+        buf[0, col['team']] = self._encode('team', team, model)
+        buf[0, col['opposition']] = self._encode('opposition', opposition, model)
+        buf[0, col['toss_winner']] = self._encode('toss_winner', toss_winner, model)
+        buf[0, col['toss_choice']] = self._encode('toss_choice', toss_choice, model)
+        buf[0, col['innings']] = innings
+        for name, value in self.rolling_features(team, venue).items():
+            buf[0, col[name]] = value
+
+        prediction = float(model.single_booster.inplace_predict(buf, validate_features=False)[0])
+        PREDICT_SECONDS.observe(time.perf_counter() - start, kind='single')
+        return prediction
+
+    def predict_batch(self, rows, model=None):
+        # rows: list of dicts with the predict() keyword arguments.
+        # Encodes every column in one pass and runs a single model call.
+        model = model or self.load_model()
+        if not rows:
+            return np.empty(0)
+        start = time.perf_counter()
+        data = pd.DataFrame.from_records(rows)
+        rolling = pd.DataFrame([self.rolling_features(team, venue) for team, venue in zip(data['team'], data['venue'])],
+                               columns=ROLLING_FEATURES)
+        matrix = np.empty((len(data), len(FEATURES)), dtype=np.float32)
+        for name in FEATURES:
+            if name in CATEGORICAL:
+                values = data[name].astype(str).map(model.encoders.get(name, {})).astype(float)
+            elif name in ROLLING_FEATURES:
+                values = rolling[name]
             else:
-                raise FileNotFoundError(f"Model not found at {self.model_path}")
-                
-    def predict(self, season, venue, team, opposition, toss_winner, toss_choice, innings):
-        self.load_model()
-        
-        # Simplified Feature Vector construction
-        # Ideally, we load feature scaling/encoders pipelines.
-        # Here we manually construct the input assuming consistency with training data categories.
-        # Since categories were encoded using pandas astype('category').cat.codes, 
-        # we need to ensure the same mapping.
-        
-        # NOTE: This approach is fragile without saved encoders.
-        # For this prototype: we assume simple numeric inputs or re-map based on known lists.
-        # But UI sends strings.
-        
-        # Hardcoding the mapping (This is not ideal for prod but works for prototype)
-        # We need to know the mapping used during training.
-        # Let's inspect the model features via `train.py` output or simple assumption.
-        
-        # Assuming simple hash or sorted index logic for now to get roughly correct input.
-        # Better: Load the training data to re-create the encoder logic.
-        
-        # Let's construct a DataFrame with the exact column structure
-        input_data = pd.DataFrame([{
-            'season': season,
-            'venue': self._encode('venue', venue),
-            'team': self._encode('team', team),
-            'opposition': self._encode('opposition', opposition),
-            'toss_winner': self._encode('toss_winner', toss_winner),
-            'toss_choice': self._encode('toss_choice', toss_choice),
-            'innings': innings,
-            'team_avg_runs_5': 160, # Approximation or query DB
-            'team_avg_runs_all': 155,
-            'venue_avg_runs': 165
-        }])
-        
-        # Re-order columns to match training
-        features = ['season', 'venue', 'team', 'opposition', 'toss_winner', 'toss_choice', 'innings', 
-                    'team_avg_runs_5', 'team_avg_runs_all', 'venue_avg_runs']
-        
-        input_data = input_data[features]
-        prediction = self.model.predict(input_data)[0]
-        return float(prediction)
-
-    def _encode(self, col, val):
-        # Extremely simplified encoder for demo purposes
-        # In real app: Load LabelEncoder artifact
-        # Here: Use hash modulo or simple mapping
-        return abs(hash(val)) % 10 # This is just a placeholder to run. 
-        # To fix: Save encoders in train.py!
+                values = data[name]
+            matrix[:, self._column[name]] = values
+        predictions = model.booster.inplace_predict(matrix, validate_features=False)
+        PREDICT_SECONDS.observe(time.perf_counter() - start, kind='batch')
+        return predictions
+
+    def _encode(self, col, val, model=None):
+        # Category codes saved with the model; unseen values are treated as missing
+        encoders = (model or self.current).encoders
+        return encoders.get(col, {}).get(str(val), np.nan)
@@ -0,0 +1,115 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime
+import xgboost as xgb
+
+REGISTRY_PATH = "src/ml/artifacts/registry"
+MODEL_FILE = "model.ubj" # XGBoost native binary format
+META_FILE = "meta.json"
+ACTIVE_FILE = "ACTIVE"
+# Published version directories; staging dirs (.vNNNN-xxxx) never match
+VERSION_RE = re.compile(r"^v\d{4,}$")
+
+class LoadedModel:
+    # Immutable snapshot served by Predictor; swapped as a whole on promotion
+    def __init__(self, version, booster, meta):
+        self.version = version
+        self.meta = meta
+        self.encoders = meta.get('encoders', {})
+        self.features = meta.get('features', [])
+        self.booster = booster
+        # A single row gains nothing from a thread pool, and requests already
+        # run in parallel; batches keep the multi-threaded booster
+        self.single_booster = booster.copy()
+        self.single_booster.set_param({'nthread': 1})
+
+class ModelRegistry:
+    # <root>/<version>/{model.ubj, meta.json} plus an ACTIVE pointer file.
+    # Versions are written to a temp dir and renamed, and ACTIVE is replaced
+    # atomically, so readers never see a half-written model.
+    def __init__(self, root=REGISTRY_PATH):
+        self.root = root
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted((name for name in os.listdir(self.root)
+                       if VERSION_RE.match(name) and os.path.isfile(os.path.join(self.root, name, META_FILE))),
+                      key=lambda name: int(name[1:]))
+
+    def register(self, booster, encoders, features, metrics=None, data_version=None, params=None):
+        os.makedirs(self.root, exist_ok=True)
+        existing = self.versions()
+        version = f"v{(int(existing[-1][1:]) + 1) if existing else 1:04d}"
+        meta = {
+            'version': version,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'features': list(features),
+            'encoders': encoders,
+            'metrics': metrics or {},
+            'data_version': data_version,
+            'params': params or {},
+        }
+        staging = tempfile.mkdtemp(prefix=f".{version}-", dir=self.root)
+        try:
+            os.chmod(staging, 0o755)
+            booster.save_model(os.path.join(staging, MODEL_FILE))
+            with open(os.path.join(staging, META_FILE), "w") as f:
+                json.dump(meta, f, indent=1, sort_keys=True)
+            os.rename(staging, os.path.join(self.root, version))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return version
+
+    def promote(self, version):
+        if version not in self.versions():
+            raise ValueError(f"Unknown model version {version}")
+        tmp = os.path.join(self.root, f".{ACTIVE_FILE}.tmp")
+        with open(tmp, "w") as f:
+            f.write(version)
+        os.replace(tmp, os.path.join(self.root, ACTIVE_FILE))
+
+    def active_version(self):
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def load(self, version=None):
+        version = version or self.active_version()
+        if version is None:
+            raise FileNotFoundError(f"No active model in registry {self.root}")
+        path = os.path.join(self.root, version)
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        booster = xgb.Booster()
+        booster.load_model(os.path.join(path, MODEL_FILE))
+        return LoadedModel(version, booster, meta)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="List or promote registered models")
+    parser.add_argument("--root", default=REGISTRY_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list")
+    promote = sub.add_parser("promote", help="Make a version active (also used to roll back)")
+    promote.add_argument("version")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == "promote":
+        registry.promote(args.version)
+        print(f"Promoted {args.version}")
+    else:
+        active = registry.active_version()
+        for version in registry.versions():
+            with open(os.path.join(registry.root, version, META_FILE)) as f:
+                meta = json.load(f)
+            marker = "*" if version == active else " "
+            print(f"{marker} {version}  {meta['created_at']}  data v{meta['data_version']}  "
+                  f"MAE {meta['metrics'].get('mae', float('nan')):.2f}")
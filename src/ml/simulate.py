@@ -0,0 +1,173 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sqlalchemy import select, func, case
+from src.etl.schema import BallByBall, Match, get_engine
+
+OVERS = 20
+# ball_by_ball.over_number counts from 1 (1-20), as on a scorecard
+FIRST_OVER = 1
+BALLS_PER_OVER = 6
+MAX_WICKETS = 10
+# Ball outcomes: 0-6 runs, then a wicket (scored as 0 runs)
+OUTCOME_RUNS = np.array([0, 1, 2, 3, 4, 5, 6, 0])
+WICKET = len(OUTCOME_RUNS) - 1
+PHASES = [(0, 6), (6, 15), (15, 20)] # powerplay, middle, death overs
+# Pseudo-balls of the phase baseline mixed into each venue/team estimate, so
+# sparse histories stay close to the league average
+PRIOR_BALLS = 600
+DEFAULT_SIMULATIONS = 10000
+SIM_WORKERS = int(os.environ.get('IPL_SIM_WORKERS', 1))
+QUANTILES = [5, 25, 50, 75, 95]
+
+def _phase_of_over():
+    phase = np.empty(OVERS, dtype=np.int64)
+    for i, (start, end) in enumerate(PHASES):
+        phase[start:end] = i
+    return phase
+
+PHASE_OF_OVER = _phase_of_over()
+
+def outcome_counts(conn):
+    # Ball counts grouped by over, venue, sides and outcome; small enough to
+    # fit in memory however many balls have been loaded
+    import pandas as pd
+    b, m = BallByBall.__table__, Match.__table__
+    outcome = case((b.c.is_wicket == True, WICKET), (b.c.total_runs > 6, 6), else_=func.coalesce(b.c.total_runs, 0))
+    batting = case((b.c.innings_no == 1, m.c.team1_name), else_=m.c.team2_name)
+    bowling = case((b.c.innings_no == 1, m.c.team2_name), else_=m.c.team1_name)
+    query = select(
+        b.c.over_number.label('over'), m.c.venue_stadium.label('venue'), batting.label('batting'),
+        bowling.label('bowling'), outcome.label('outcome'), func.count().label('n'),
+    ).join(m, m.c.match_id == b.c.match_id).where(b.c.innings_no.in_([1, 2]), b.c.over_number.isnot(None))
+    query = query.group_by(b.c.over_number, m.c.venue_stadium, batting, bowling, outcome)
+    return pd.DataFrame(conn.execute(query).fetchall(), columns=['over', 'venue', 'batting', 'bowling', 'outcome', 'n'])
+
+class OutcomeModel:
+    # p(outcome | over) from all balls, scaled per phase by how the venue, the
+    # batting side and the bowling side differ from the league in that phase
+    def __init__(self, over_probs, phase_probs, factors, balls, version=None):
+        self.over_probs = over_probs
+        self.phase_probs = phase_probs
+        self.factors = factors
+        self.balls = balls
+        self.version = version
+
+    @classmethod
+    def fit(cls, counts, version=None):
+        k = len(OUTCOME_RUNS)
+        # 0-based over index; anything outside the 20 overs is not a real ball
+        counts = counts.assign(over=counts['over'] - FIRST_OVER)
+        counts = counts[(counts['over'] >= 0) & (counts['over'] < OVERS)].astype({'over': int})
+        if counts.empty:
+            return cls(np.full((OVERS, k), 1.0 / k), np.full((len(PHASES), k), 1.0 / k), {}, 0, version)
+        counts['phase'] = PHASE_OF_OVER[counts['over'].to_numpy()]
+
+        over, phase = counts['over'].to_numpy(), counts['phase'].to_numpy()
+        outcome, n = counts['outcome'].to_numpy(dtype=np.int64), counts['n'].to_numpy(dtype=float)
+        over_counts = np.zeros((OVERS, k))
+        np.add.at(over_counts, (over, outcome), n)
+        phase_counts = np.zeros((len(PHASES), k))
+        np.add.at(phase_counts, (phase, outcome), n)
+        phase_probs = (phase_counts + 1) / (phase_counts + 1).sum(1, keepdims=True)
+        over_probs = (over_counts + phase_probs[PHASE_OF_OVER]) / (over_counts.sum(1, keepdims=True) + 1)
+
+        factors = {}
+        for side in ['venue', 'batting', 'bowling']:
+            grouped = counts.groupby([side, 'phase', 'outcome'])['n'].sum()
+            table = {}
+            for key, part in grouped.groupby(level=0):
+                c = np.zeros((len(PHASES), k))
+                np.add.at(c, (part.index.get_level_values(1), part.index.get_level_values(2)), part.to_numpy())
+                smoothed = (c + PRIOR_BALLS * phase_probs) / (c.sum(1, keepdims=True) + PRIOR_BALLS)
+                table[key] = smoothed / phase_probs
+            factors[side] = table
+        return cls(over_probs, phase_probs, factors, int(counts['n'].sum()), version)
+
+    def probabilities(self, batting, bowling, venue):
+        probs = self.over_probs.copy()
+        for side, key in [('venue', venue), ('batting', batting), ('bowling', bowling)]:
+            factor = self.factors.get(side, {}).get(key)
+            if factor is not None:
+                probs *= factor[PHASE_OF_OVER]
+        return probs / probs.sum(1, keepdims=True)
+
+def simulate_innings(probs, n, seed=None):
+    # All n innings at once: one uniform draw per ball, mapped to an outcome
+    # through each over's CDF; balls after the tenth wicket are masked out
+    rng = np.random.default_rng(seed)
+    cdf = np.cumsum(probs, axis=1)[:, :-1].astype(np.float32)
+    draws = rng.random((n, OVERS, BALLS_PER_OVER), dtype=np.float32)
+    # Outcome index = number of CDF steps the draw clears, counted a step at a time
+    outcomes = np.zeros(draws.shape, dtype=np.int8)
+    for k in range(cdf.shape[1]):
+        outcomes += draws >= cdf[:, k][None, :, None]
+    outcomes = outcomes.reshape(n, -1)
+    wickets = outcomes == WICKET
+    fallen = np.cumsum(wickets, axis=1, dtype=np.int8)
+    alive = (fallen - wickets) < MAX_WICKETS
+    runs = (OUTCOME_RUNS.astype(np.int8)[outcomes] * alive).sum(axis=1, dtype=np.int32)
+    return runs, np.minimum(fallen[:, -1], MAX_WICKETS)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._max_workers != workers:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = ProcessPoolExecutor(max_workers=workers)
+        return _pool
+
+def simulate_many(probs, n, seed=None, workers=SIM_WORKERS):
+    # Optionally split the simulations across processes, each with its own stream
+    if workers <= 1 or n < 2 * workers:
+        return simulate_innings(probs, n, seed)
+    sizes = [len(part) for part in np.array_split(np.arange(n), workers)]
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    seeds = seed.spawn(workers)
+    parts = list(_get_pool(workers).map(simulate_innings, [probs] * workers, sizes, seeds))
+    return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+def _summary(runs, wickets):
+    return {
+        'mean': round(float(runs.mean()), 1),
+        'quantiles': {f"p{q}": float(v) for q, v in zip(QUANTILES, np.percentile(runs, QUANTILES))},
+        'mean_wickets': round(float(wickets.mean()), 2),
+    }
+
+def simulate_match(model, batting, bowling, venue, n=DEFAULT_SIMULATIONS, target=None, seed=None, workers=SIM_WORKERS):
+    # With a target, `batting` is chasing it; otherwise both innings are
+    # simulated and the win probability is for the side batting first
+    seeds = np.random.SeedSequence(seed).spawn(2)
+    first = simulate_many(model.probabilities(batting, bowling, venue), n, seeds[0], workers)
+    result = {'batting': batting, 'bowling': bowling, 'venue': venue, 'simulations': n,
+              'first_innings': _summary(*first)}
+    if target is not None:
+        result['win_probability'] = round(float((first[0] >= target).mean()), 4)
+        return result
+    second = simulate_many(model.probabilities(bowling, batting, venue), n, seeds[1], workers)
+    result['second_innings'] = _summary(*second)
+    wins = (first[0] > second[0]).mean() + 0.5 * (first[0] == second[0]).mean()
+    result['win_probability'] = round(float(wins), 4)
+    return result
+
+class OutcomeModelHolder:
+    # Refit from ball_by_ball whenever ingest bumps the data version
+    def __init__(self):
+        self.model = None
+        self.lock = threading.Lock()
+
+    def get(self, version):
+        if self.model is None or self.model.version != version:
+            with self.lock:
+                if self.model is None or self.model.version != version:
+                    with get_engine().connect() as conn:
+                        self.model = OutcomeModel.fit(outcome_counts(conn), version)
+        return self.model
+
+outcome_model = OutcomeModelHolder()
@@ -1,17 +1,57 @@
+import argparse
 import pandas as pd
 import xgboost as xgb
 from sklearn.metrics import mean_absolute_error, mean_squared_error
-from src.ml.features import load_training_data, prepare_features, calculate_rolling_features
-import joblib
-import os
+from sqlalchemy import select
+from src.etl.schema import get_engine, DataVersion
+from src.ml.feature_store import FeatureStore, ROLLING_FEATURES
+from src.ml.features import load_training_data, prepare_features, calculate_rolling_features, fit_encoders
+from src.ml.registry import ModelRegistry, REGISTRY_PATH
+from src.ml.tuning import search
 import numpy as np
 
-def train_model():
+def check_feature_parity(data, replayed):
+    known = replayed.notna()
+    diff = (data[ROLLING_FEATURES] - replayed)[known].abs().max().max()
+    print(f"Feature store parity: max abs diff {diff if pd.notna(diff) else 0.0:.6f}")
+
+    with get_engine().connect() as conn:
+        stored = FeatureStore.load(conn)
+    if stored.overall.count != len(data):
+        print(f"Warning: online feature store has {stored.overall.count} innings, training data has {len(data)}; "
+              "re-run ingest so serving features match")
+
+DEFAULT_PARAMS = {
+    'n_estimators': 200,
+    'learning_rate': 0.05,
+    'max_depth': 4,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+}
+
+def training_data_version():
+    with get_engine().connect() as conn:
+        return conn.execute(select(DataVersion.version).where(DataVersion.id == 1)).scalar() or 0
+
+def train_model(params=None, search_trials=0, workers=None, min_train_seasons=5, promote=True,
+                registry_path=REGISTRY_PATH):
     print("Loading data...")
+    data_version = training_data_version()
     raw_data = load_training_data()
     
     print("Calculating features...")
+    # Serving reads the same features from the online store; check they agree
+    replayed = FeatureStore().replay(raw_data)
     data = calculate_rolling_features(raw_data)
+    check_feature_parity(data, replayed)
+
+    # One mapping for train, test and serving
+    encoders = fit_encoders(data)
+
+    params = dict(params or DEFAULT_PARAMS)
+    if search_trials:
+        result = search(data, encoders, search_trials, workers, min_train_seasons)
+        params = dict(result['best']['params'], n_estimators=result['best']['n_estimators'])
     
     # Time-based split using Season
     # Train: < 2022
@@ -23,8 +63,8 @@ def train_model():
     train_data = data[train_mask]
     test_data = data[test_mask]
     
-    X_train, y_train = prepare_features(train_data)
-    X_test, y_test = prepare_features(test_data)
+    X_train, y_train = prepare_features(train_data, encoders)
+    X_test, y_test = prepare_features(test_data, encoders)
     
     print(f"Training on {len(X_train)} samples, Testing on {len(X_test)} samples")
     
@@ -36,11 +76,8 @@ def train_model():
     # XGBoost
     model = xgb.XGBRegressor(
         objective='reg:squarederror',
-        n_estimators=200,
-        learning_rate=0.05,
-        max_depth=4,
-        subsample=0.8,
-        colsample_bytree=0.8
+        tree_method='hist',
+        **params
     )
     
     model.fit(X_train, y_train)
@@ -60,10 +97,24 @@ def train_model():
     for f, i in zip(features, importance):
         print(f"{f}: {i:.4f}")
         
-    # Save Model
-    os.makedirs("src/ml/artifacts", exist_ok=True)
-    joblib.dump(model, "src/ml/artifacts/model.pkl")
-    print("Model saved to src/ml/artifacts/model.pkl")
+    # Register the model and its metadata, then point serving at it
+    registry = ModelRegistry(registry_path)
+    metrics = {'mae': float(mae_xgb), 'rmse': float(rmse_xgb), 'baseline_mae': float(mae_baseline),
+               'train_rows': len(X_train), 'test_rows': len(X_test)}
+    version = registry.register(model.get_booster(), encoders, list(features), metrics, data_version, params)
+    print(f"Model registered as {version} in {registry.root}")
+    if promote:
+        registry.promote(version)
+        print(f"Promoted {version}")
+    return version
 
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Train the innings score model")
+    parser.add_argument("--search", type=int, default=0, metavar="TRIALS",
+                        help="Run a season-by-season CV hyperparameter search with this many trials first")
+    parser.add_argument("--workers", type=int, default=None, help="Processes for the search (default: all cores)")
+    parser.add_argument("--min-train-seasons", type=int, default=5)
+    parser.add_argument("--no-promote", action="store_true", help="Register the model without making it active")
+    args = parser.parse_args()
+    train_model(search_trials=args.search, workers=args.workers, min_train_seasons=args.min_train_seasons,
+                promote=not args.no_promote)
@@ -0,0 +1,111 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import xgboost as xgb
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+from src.ml.features import prepare_features
+
+SEARCH_SPACE = {
+    'max_depth': [3, 4, 5, 6],
+    'learning_rate': [0.02, 0.05, 0.1],
+    'subsample': [0.7, 0.8, 1.0],
+    'colsample_bytree': [0.6, 0.8, 1.0],
+    'min_child_weight': [1, 3, 5, 10],
+    'reg_lambda': [1.0, 5.0, 10.0],
+}
+MAX_ESTIMATORS = 1000
+EARLY_STOPPING_ROUNDS = 50
+
+_folds = None
+_threads = 1
+
+def season_folds(data, encoders, min_train_seasons=5):
+    # Rolling origin: for each season after the first `min_train_seasons`, fit on
+    # all earlier seasons except the last (used for early stopping), test on it.
+    # Features are encoded once per fold here and reused by every trial.
+    seasons = sorted(data['season'].unique())
+    folds = []
+    for test_season in seasons[min_train_seasons:]:
+        stop_season = max(s for s in seasons if s < test_season)
+        parts = {
+            'fit': data[data['season'] < stop_season],
+            'stop': data[data['season'] == stop_season],
+            'test': data[data['season'] == test_season],
+        }
+        fold = {'season': int(test_season)}
+        for name, part in parts.items():
+            X, y = prepare_features(part, encoders)
+            fold[f'X_{name}'] = X.to_numpy(dtype=np.float32)
+            fold[f'y_{name}'] = y.to_numpy(dtype=np.float32)
+        folds.append(fold)
+    return folds
+
+def sample_params(n_trials, seed=0):
+    rng = np.random.default_rng(seed)
+    trials = []
+    for _ in range(n_trials):
+        trials.append({name: values[rng.integers(len(values))] for name, values in SEARCH_SPACE.items()})
+    return trials
+
+def _init_worker(folds, threads):
+    global _folds, _threads
+    _folds = folds
+    _threads = threads
+
+def evaluate(params, folds=None, threads=None):
+    folds = folds if folds is not None else _folds
+    maes, rmses, rounds = [], [], []
+    for fold in folds:
+        model = xgb.XGBRegressor(
+            objective='reg:squarederror',
+            tree_method='hist',
+            n_estimators=MAX_ESTIMATORS,
+            early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+            n_jobs=threads or _threads,
+            **params
+        )
+        model.fit(fold['X_fit'], fold['y_fit'], eval_set=[(fold['X_stop'], fold['y_stop'])], verbose=False)
+        preds = model.predict(fold['X_test'])
+        maes.append(mean_absolute_error(fold['y_test'], preds))
+        rmses.append(np.sqrt(mean_squared_error(fold['y_test'], preds)))
+        rounds.append(model.best_iteration + 1)
+    return {'params': params, 'mae': float(np.mean(maes)), 'rmse': float(np.mean(rmses)),
+            'n_estimators': int(np.median(rounds))}
+
+def baseline(folds):
+    # Global average of the training seasons, as in train_model()
+    maes, rmses = [], []
+    for fold in folds:
+        y_train = np.concatenate([fold['y_fit'], fold['y_stop']])
+        preds = np.full(len(fold['y_test']), y_train.mean())
+        maes.append(mean_absolute_error(fold['y_test'], preds))
+        rmses.append(np.sqrt(mean_squared_error(fold['y_test'], preds)))
+    return {'mae': float(np.mean(maes)), 'rmse': float(np.mean(rmses))}
+
+def search(data, encoders, n_trials=20, workers=None, min_train_seasons=5, seed=0):
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, n_trials))
+    # Fixed thread budget per trial so workers x threads never exceeds the cores
+    threads = max(1, cpus // workers)
+
+    start = time.perf_counter()
+    folds = season_folds(data, encoders, min_train_seasons)
+    trials = sample_params(n_trials, seed)
+    print(f"Searching {n_trials} trials x {len(folds)} season folds on {workers} workers x {threads} threads...")
+
+    if workers == 1:
+        results = [evaluate(params, folds, threads) for params in trials]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(folds, threads)) as pool:
+            results = list(pool.map(evaluate, trials))
+
+    elapsed = time.perf_counter() - start
+    best = min(results, key=lambda r: r['mae'])
+    base = baseline(folds)
+    print(f"Search took {elapsed:.1f}s ({n_trials / elapsed * 60:.1f} trials/min)")
+    print(f"Baseline (Global Avg) CV MAE: {base['mae']:.2f}, RMSE: {base['rmse']:.2f}")
+    print(f"Best CV MAE: {best['mae']:.2f}, RMSE: {best['rmse']:.2f} with {best['params']} "
+          f"and {best['n_estimators']} trees")
+    return {'best': best, 'baseline': base, 'trials': results, 'seconds': elapsed,
+            'trials_per_minute': n_trials / elapsed * 60}
@@ -0,0 +1,212 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds in seconds; every histogram also gets +Inf
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_QUERY_SECONDS = float(os.environ.get('IPL_SLOW_QUERY_MS', 100)) / 1000
+SLOW_QUERY_CHARS = 200
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.series.get(self._key(labels), 0)
+
+    def render(self):
+        with self.lock:
+            series = sorted(self.series.items())
+        return self.header() + [f"{self.name}{_label_text(self.labels, key)} {_number(v)}" for key, v in series]
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.series[self._key(labels)] = value
+
+class Histogram(Metric):
+    # Cumulative buckets in the Prometheus exposition format, so quantiles
+    # can be computed server side with histogram_quantile()
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            counts = self.series.get(key)
+            if counts is None:
+                # Per-bucket counts, then the observation count and sum
+                counts = self.series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            counts[-2] += 1
+            counts[-1] += value
+
+    def count(self, **labels):
+        counts = self.series.get(self._key(labels))
+        return counts[-2] if counts else 0
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        with self.lock:
+            series = sorted((key, list(counts)) for key, counts in self.series.items())
+        lines = self.header()
+        names = self.labels + ('le',)
+        for key, counts in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_label_text(names, key + (_number(bound),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_label_text(names, key + ('+Inf',))} {counts[-2]}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_number(counts[-1])}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {counts[-2]}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        # Re-registering returns the existing metric, so modules can declare
+        # theirs at import time in any order
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, labels, **kwargs)
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=()):
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def render(self):
+        lines = []
+        for name in sorted(self.metrics):
+            lines.extend(self.metrics[name].render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+QUERY_SECONDS = REGISTRY.histogram('ipl_db_query_seconds', 'SQL statement execution time', ['statement'])
+SLOW_QUERIES = REGISTRY.counter('ipl_db_slow_queries_total', 'SQL statements slower than IPL_SLOW_QUERY_MS',
+                                ['statement'])
+STAGE_SECONDS = REGISTRY.histogram('ipl_ingest_stage_seconds', 'Time spent in each ingest stage', ['stage'],
+                                   buckets=(0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+
+# Per-request query tally ({'queries': n, 'seconds': s}) set by the API
+# middleware; contextvars follow the request into the threadpool
+query_stats = contextvars.ContextVar('query_stats', default=None)
+
+def _statement_kind(statement):
+    return statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    kind = _statement_kind(statement)
+    QUERY_SECONDS.observe(elapsed, statement=kind)
+    stats = query_stats.get()
+    if stats is not None:
+        stats['queries'] += 1
+        stats['seconds'] += elapsed
+    if elapsed >= SLOW_QUERY_SECONDS:
+        SLOW_QUERIES.inc(statement=kind)
+        print(f"Slow query ({elapsed * 1000:.1f} ms): {' '.join(statement.split())[:SLOW_QUERY_CHARS]}")
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is not None:
+        starts = context.connection.info.get('query_start')
+        if starts:
+            starts.pop()
+
+_hooks_installed = False
+
+def install_sql_hooks():
+    # Listens on the Engine class, so engines created later are covered too
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+    _hooks_installed = True
+
+@contextmanager
+def stage(name, timings=None):
+    # Times one ingest step: recorded in STAGE_SECONDS and, when given, in `timings`
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        if timings is not None:
+            timings[name] = elapsed
+
+def format_timings(timings):
+    return ', '.join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
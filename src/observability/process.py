@@ -0,0 +1,42 @@
+import os
+import resource
+import sys
+import time
+
+_IMPORTED_AT = time.monotonic()
+
+def process_uptime(pid='self'):
+    # Seconds since the process started (or, for a forked worker, since the fork)
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - _IMPORTED_AT
+
+def memory_usage(pid='self'):
+    # Bytes. pss splits pages shared with other processes between them, so
+    # summing pss over the workers gives their real footprint; shared and
+    # private split rss into pages other processes also map and pages only
+    # this one does. Only rss is available off Linux.
+    try:
+        fields = {}
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+        return {
+            'rss': fields.get('Rss', 0),
+            'pss': fields.get('Pss', 0),
+            'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+            'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+        }
+    except OSError:
+        if pid != 'self':
+            return {}
+        # ru_maxrss is the peak, in kB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {'rss': peak if sys.platform == 'darwin' else peak * 1024}
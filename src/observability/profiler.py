@@ -0,0 +1,81 @@
+import collections
+import os
+import re
+import sys
+import threading
+import time
+
+# Opt-in: set IPL_PROFILE_SLOW_MS to dump a profile for every request slower than that
+PROFILE_SLOW_MS = os.environ.get('IPL_PROFILE_SLOW_MS')
+PROFILE_DIR = os.environ.get('IPL_PROFILE_DIR', 'data/profiles')
+PROFILE_INTERVAL = float(os.environ.get('IPL_PROFILE_INTERVAL_MS', 5)) / 1000
+# Samples kept in memory, across all threads
+MAX_SAMPLES = 200000
+# Leaf frames of threads that are parked rather than doing work
+IDLE_FRAMES = {('threading.py', 'wait'), ('queue.py', 'get'), ('selectors.py', 'select'), ('socket.py', 'accept')}
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+def _stack(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+class SamplingProfiler:
+    # Background thread that snapshots every thread's Python stack each
+    # interval into a ring buffer; a slow request then writes the samples
+    # taken while it ran as folded stacks ("a;b;c count" per line), the
+    # input format of flamegraph.pl and speedscope
+    def __init__(self, interval=PROFILE_INTERVAL, max_samples=MAX_SAMPLES):
+        self.interval = interval
+        self.samples = collections.deque(maxlen=max_samples)
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            now = time.perf_counter()
+            for thread_id, frame in sys._current_frames().items():
+                code = frame.f_code
+                if thread_id == own or (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                self.samples.append((now, thread_id, _stack(frame)))
+
+    def folded(self, start, end):
+        counts = collections.Counter(stack for at, _, stack in list(self.samples) if start <= at <= end)
+        return [f"{stack} {n}" for stack, n in counts.most_common()]
+
+    def dump(self, name, start, end, directory=PROFILE_DIR):
+        lines = self.folded(start, end)
+        if not lines:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_') or 'root'
+        path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{(end - start) * 1000:.0f}ms.folded")
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        return path
+
+def slow_request_profiler():
+    # None unless profiling was switched on in the environment
+    if not PROFILE_SLOW_MS:
+        return None
+    return SamplingProfiler()
@@ -27,9 +27,9 @@ async function searchPlayers() {
     }
 
     try {
-        const res = await fetch(`${API_URL}/players?search=${query}`);
+        const res = await fetch(`${API_URL}/players/search?q=${encodeURIComponent(query)}&limit=10`);
         if (!res.ok) throw new Error("API not reachable");
-        const players = await res.json();
+        const players = (await res.json()).results;
 
         resultsDiv.innerHTML = '';
 
@@ -123,6 +123,21 @@ async function predictRuns(e) {
             <div style="font-size:0.8rem; margin-top:5px;">vs ${opp} at ${venue}</div>
         `;
 
+        // Score range and win probability from the Monte Carlo simulator, when available
+        const simRes = await fetch(`${API_URL}/simulate`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ batting_team: team, bowling_team: opp, venue: venue })
+        });
+        if (simRes.ok) {
+            const sim = await simRes.json();
+            const q = sim.first_innings.quantiles;
+            resultDiv.innerHTML += `
+                <div style="font-size:0.8rem; margin-top:5px;">Likely range ${Math.round(q.p25)}-${Math.round(q.p75)}
+                    &middot; Win probability ${Math.round(sim.win_probability * 100)}%</div>
+            `;
+        }
+
     } catch (e) {
         resultDiv.innerHTML = `
             <span style="color:red">⚠️ Connection Failed</span><br>
@@ -130,3 +145,28 @@ async function predictRuns(e) {
         `;
     }
 }
+
+async function loadLeaderboards() {
+    const boards = [
+        { category: 'runs', target: 'orange-cap-list', unit: 'runs' },
+        { category: 'wickets', target: 'purple-cap-list', unit: 'wkts' }
+    ];
+    for (const board of boards) {
+        const listDiv = document.getElementById(board.target);
+        try {
+            const res = await fetch(`${API_URL}/leaderboards/${board.category}?limit=10`);
+            if (!res.ok) throw new Error("Leaderboard unavailable");
+            const data = await res.json();
+            listDiv.innerHTML = data.entries.map(e => `
+                <div style="display:flex; justify-content:space-between; padding:4px 0;">
+                    <span>${e.rank}. ${e.name || e.player_id}</span>
+                    <strong>${Math.round(e.value)} ${board.unit}</strong>
+                </div>
+            `).join('');
+        } catch (e) {
+            listDiv.innerHTML = `<p style="color:#666; font-style:italic;">Backend is offline.</p>`;
+        }
+    }
+}
+
+document.addEventListener('DOMContentLoaded', loadLeaderboards);
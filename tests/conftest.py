@@ -0,0 +1,19 @@
+import os
+import shutil
+import tempfile
+
+# The suite builds its own database from data/raw rather than relying on a
+# data/ipl.db left behind by a manual ingest. Paths are set before any src
+# module reads them at import.
+TEST_DATA = tempfile.mkdtemp(prefix='ipl-tests-')
+os.environ['IPL_DATABASE_URL'] = f"sqlite:///{os.path.join(TEST_DATA, 'ipl.db')}"
+os.environ['IPL_SEASON_INDEX'] = os.path.join(TEST_DATA, 'season_index.npz')
+os.environ['IPL_MATCHUP_DIR'] = os.path.join(TEST_DATA, 'matchups')
+os.environ['IPL_BALL_STORE_DIR'] = os.path.join(TEST_DATA, 'columnar', 'ball_by_ball')
+
+def pytest_sessionstart(session):
+    from src.etl.ingest import load_data
+    load_data()
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TEST_DATA, ignore_errors=True)
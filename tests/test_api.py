@@ -17,3 +17,232 @@ def test_player_stats():
         stats_response = client.get(f"/api/players/{pid}/stats")
         assert stats_response.status_code == 200
         assert "runs" in stats_response.json()
+
+def test_player_bowling_stats():
+    response = client.get("/api/players?limit=1")
+    if len(response.json()) > 0:
+        pid = response.json()[0]['player_id']
+        bowling_response = client.get(f"/api/players/{pid}/bowling")
+        assert bowling_response.status_code == 200
+        assert "wickets" in bowling_response.json()
+
+def test_player_stats_etag_revalidation():
+    response = client.get("/api/players?limit=1")
+    etag = response.headers["etag"]
+    assert "max-age" in response.headers["cache-control"]
+    not_modified = client.get("/api/players?limit=1", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+def test_response_cache_evicts_by_size():
+    from src.api.cache import ResponseCache
+    cache = ResponseCache(max_entries=10, max_bytes=10, ttl=60)
+    cache.set("a", '"a"', b"12345")
+    cache.set("b", '"b"', b"12345")
+    cache.get("a")
+    cache.set("c", '"c"', b"12345")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+def test_player_search_ranks_prefix_and_ignores_diacritics():
+    from src.api.search import PlayerSearchIndex
+    index = PlayerSearchIndex([
+        {'player_id': 1, 'name': 'Rohit Sharma'},
+        {'player_id': 2, 'name': 'Ishant Sharma'},
+        {'player_id': 3, 'name': 'Shárdul Thakur'},
+    ])
+    total, results = index.search("shar")
+    assert total == 3
+    # Name prefix ranks above a later word prefix, then shorter names first
+    assert [p['player_id'] for p in results] == [3, 1, 2]
+    assert [p['player_id'] for p in index.search("SHARDUL")[1]] == [3]
+    assert index.search("r sharma")[1][0]['player_id'] == 1
+    total, page = index.search("a", limit=1, offset=1)
+    assert total == 3 and [p['player_id'] for p in page] == [2]
+
+def test_player_search_endpoint_shape():
+    response = client.get("/api/players/search?q=kohli&limit=5")
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body) == {"total", "limit", "offset", "results"}
+    assert body["total"] >= len(body["results"])
+
+def test_batch_prediction_reports_row_errors():
+    rows = [
+        {"venue": "Wankhede Stadium", "team": "MI", "opposition": "CSK", "toss_winner": "MI", "toss_choice": "bat", "innings": 1},
+        {"venue": "Wankhede Stadium", "team": "CSK"},
+    ]
+    response = client.post("/api/predict/batch", json=rows)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 2 and body["errors"] == 1
+    assert body["results"][0]["predicted_runs"] is not None
+    assert "opposition" in body["results"][1]["error"]
+
+def test_batch_prediction_accepts_csv():
+    csv_body = "venue,team,opposition,toss_winner,toss_choice,innings\nEden Gardens,KKR,RCB,RCB,bowl,2\n"
+    response = client.post("/api/predict/batch", content=csv_body, headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+    assert response.json()["results"][0]["predicted_runs"] is not None
+
+def test_leaderboards_are_ranked():
+    response = client.get("/api/leaderboards/runs?season=2016&limit=3")
+    assert response.status_code == 200
+    entries = response.json()["entries"]
+    assert [e["rank"] for e in entries] == [1, 2, 3]
+    assert entries[0]["value"] >= entries[1]["value"] >= entries[2]["value"]
+
+    economy = client.get("/api/leaderboards/economy?limit=5").json()
+    values = [e["value"] for e in economy["entries"]]
+    assert values == sorted(values) and economy["min_balls"] > 0
+    assert client.get("/api/leaderboards/catches").status_code == 404
+
+def test_season_range_stats_use_prefix_sums():
+    kohli = 49752
+    career = client.get(f"/api/players/{kohli}/stats").json()
+    assert client.get(f"/api/players/{kohli}/stats?from_season=2000&to_season=2100").json() == career
+    season = client.get(f"/api/players/{kohli}/stats?from_season=2016&to_season=2016").json()
+    assert season["runs"] == 973 and season["hundreds"] == 4
+    before, since = [client.get(f"/api/players/{kohli}/stats?{q}").json()["runs"]
+                     for q in ["to_season=2015", "from_season=2016"]]
+    assert before + since == career["runs"]
+
+    bowling = client.get(f"/api/players/{kohli}/bowling").json()
+    assert client.get(f"/api/players/{kohli}/bowling?from_season=2008").json() == bowling
+    assert client.get(f"/api/players/{kohli}/stats?from_season=2020&to_season=2016").status_code == 400
+
+def test_matchup_endpoints(monkeypatch):
+    from sqlalchemy import create_engine, insert
+    from src.api.cache import data_version
+    from src.etl.schema import create_schema, BallByBall
+    from src.etl.matchups import MatchupStore, matchup_store
+
+    batter, other, pace, spin, part_timer = 900001, 900002, 900101, 900102, 900103
+    # (batter, bowler, runs, dismissal); a run out is not the bowler's wicket
+    deliveries = ([(batter, pace, r, None) for r in [0, 4, 1, 0, 6]] + [(batter, pace, 0, 'bowled')]
+                  + [(batter, spin, 1, None), (batter, spin, 1, 'caught'), (batter, spin, 0, None), (batter, spin, 0, 'run out')]
+                  + [(batter, part_timer, r, None) for r in [4, 4, 2]]
+                  + [(other, spin, 0, None), (other, spin, 0, None)])
+    balls = [dict(match_id=1, batsman_id=b, bowler_id=bw, batsman_runs=r, total_runs=r, is_four=r == 4, is_six=r == 6,
+                  is_wicket=kind is not None, dismissal_kind=None if kind in (None, 'bowled', 'caught') else kind)
+             for b, bw, r, kind in deliveries]
+    engine = create_engine("sqlite://")
+    create_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(BallByBall.__table__), balls)
+        store = MatchupStore.build(conn, version=data_version.current())
+    monkeypatch.setattr(matchup_store, 'store', store)
+
+    response = client.get(f"/api/matchups/{batter}/{pace}")
+    assert response.status_code == 200
+    assert response.json() == {"batter_id": batter, "bowler_id": pace, "balls": 6, "runs": 11, "dismissals": 1,
+                               "dots": 3, "fours": 1, "sixes": 1, "strike_rate": 183.33, "average": 11.0}
+    assert client.get(f"/api/matchups/{batter}/{other}").json()["balls"] == 0
+
+    # Most dismissals first, then fewest runs per ball
+    worst = client.get(f"/api/players/{batter}/worst-bowlers?min_balls=1").json()
+    assert [(w["player_id"], w["balls"], w["runs"], w["dismissals"]) for w in worst] == [
+        (spin, 4, 2, 1), (pace, 6, 11, 1), (part_timer, 3, 10, 0)]
+    assert [w["player_id"] for w in client.get(f"/api/players/{batter}/worst-bowlers?min_balls=5").json()] == [pace]
+    victims = client.get(f"/api/players/{spin}/best-victims?min_balls=1").json()
+    assert [(v["player_id"], v["balls"], v["dismissals"]) for v in victims] == [(batter, 4, 1), (other, 2, 0)]
+
+def test_simulate_needs_ball_by_ball():
+    body = {"batting_team": "MI", "bowling_team": "CSK", "venue": "Wankhede Stadium", "simulations": 1000}
+    response = client.post("/api/simulate", json=body)
+    assert response.status_code in (200, 503)
+    if response.status_code == 200:
+        assert 0 <= response.json()["win_probability"] <= 1
+
+def test_partnership_endpoints():
+    kohli, de_villiers = 49752, 46533
+    pair = client.get(f"/api/partnerships/{kohli}/{de_villiers}").json()
+    assert pair == client.get(f"/api/partnerships/{de_villiers}/{kohli}").json()
+    assert pair["player_a"] == de_villiers and pair["stands"] > 0 and pair["best"] <= pair["runs"]
+
+    partners = client.get(f"/api/players/{kohli}/partners?limit=5").json()
+    assert len(partners) == 5 and partners[0]["runs"] >= partners[-1]["runs"]
+    assert kohli not in [p["partner_id"] for p in partners]
+
+    collapse = client.get("/api/teams/Mumbai/collapse").json()
+    assert [w["wicket"] for w in collapse] == list(range(1, len(collapse) + 1))
+    assert all(0 <= w["collapse_rate"] <= 1 for w in collapse)
+    assert client.get("/api/teams/Nowhere/collapse").status_code == 404
+
+def test_export_streams_whole_dataset():
+    import csv
+    import io
+    import json as jsonlib
+    from src.api.export import export_stream
+
+    response = client.get("/api/export/batting_cards?season=2016&format=csv")
+    assert response.status_code == 200 and response.headers["content-encoding"] == "gzip"
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    ids = [int(r["id"]) for r in rows]
+    assert ids == sorted(ids) and len(ids) == len(set(ids)) > 1000
+    plain = client.get("/api/export/players?limit=5", headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert "content-encoding" not in plain.headers and len(plain.text.splitlines()) == 5
+
+    # Small pages must give the same rows as one page
+    paged = b"".join(export_stream("players", "ndjson", page_size=7, limit=50))
+    whole = client.get("/api/export/players?limit=50").content
+    assert paged == whole
+    last = jsonlib.loads(whole.splitlines()[-1])["player_id"]
+    rest = client.get(f"/api/export/players?after={last}&limit=1").content
+    assert jsonlib.loads(rest)["player_id"] > last
+
+    assert client.get("/api/export/players?season=2016").status_code == 400
+    assert client.get("/api/export/nothing").status_code == 404
+    after = client.get("/api/players?limit=2").json()[-1]["player_id"]
+    assert client.get(f"/api/players?after_id={after}&limit=1").json()[0]["player_id"] > after
+
+def test_metrics_record_route_latency_and_queries():
+    from src.api.instrumentation import REQUEST_SECONDS
+    pid = client.get("/api/players?limit=1").json()[0]["player_id"]
+    route = "/api/players/{player_id}/stats"
+    before = REQUEST_SECONDS.count(method="GET", route=route, status=200)
+    response = client.get(f"/api/players/{pid}/stats?from_season=2010")
+    assert REQUEST_SECONDS.count(method="GET", route=route, status=200) == before + 1
+    assert response.headers["server-timing"].startswith("db;dur=")
+
+    body = client.get("/metrics").text
+    assert '# TYPE ipl_http_request_seconds histogram' in body
+    assert f'ipl_http_request_seconds_bucket{{method="GET",route="{route}",status="200",le="+Inf"}}' in body
+    assert 'ipl_db_query_seconds_count{statement="SELECT"}' in body
+
+def test_sampling_profiler_writes_folded_stacks(tmp_path):
+    import time
+    from src.observability.profiler import SamplingProfiler
+
+    def busy(until):
+        while time.perf_counter() < until:
+            pass
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    start = time.perf_counter()
+    busy(start + 0.1)
+    end = time.perf_counter()
+    profiler.stop()
+    path = profiler.dump("GET /api/slow", start, end, directory=tmp_path)
+    lines = open(path).read().splitlines()
+    assert any("busy (test_api.py" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+
+def test_api_import_is_lazy_and_ready_reports_warm_up():
+    import subprocess
+    import sys
+    code = "import sys, src.api.main; print(sorted(m for m in ('numpy', 'pandas', 'xgboost') if m in sys.modules))"
+    loaded = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert loaded.strip() == "[]"
+
+    from src.api.main import Readiness
+    calls = []
+    readiness = Readiness([('ok', lambda: calls.append(1)), ('broken', lambda: 1 / 0)])
+    assert not readiness.report()['ready']
+    readiness.warm_up()
+    report = readiness.report()
+    assert report['ready'] and calls == [1]
+    assert report['components']['ok']['status'] == 'ready'
+    assert report['components']['broken']['status'].startswith('failed')
+    assert "model" in client.get("/ready").json()["components"]
@@ -13,3 +13,233 @@ def test_tables_populated():
         
         assert matches > 0, "Matches table is empty"
         assert players > 0, "Players table is empty"
+
+def test_bulk_load_matches_raw_row_counts():
+    from src.etl.ingest import load_data
+    engine = create_engine("sqlite://")
+    stats = load_data(engine=engine)
+    assert stats['players']['rows'] > 0
+    with engine.connect() as conn:
+        batting = conn.execute(text("SELECT count(*) FROM batting_cards")).scalar()
+        bowling = conn.execute(text("SELECT count(*) FROM bowling_cards")).scalar()
+        # The pooled connection gets its fsync setting back after the load
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() != 0
+    assert batting == stats['batting_cards']['rows']
+    assert bowling == stats['bowling_cards']['rows']
+
+def test_incremental_ingest_is_idempotent():
+    from src.etl.ingest import load_data
+    engine = create_engine("sqlite://")
+    load_data(engine=engine)
+    with engine.begin() as conn:
+        match_id = conn.execute(text("SELECT match_id FROM matches ORDER BY match_date DESC LIMIT 1")).scalar()
+        for table in ['matches', 'batting_cards', 'bowling_cards']:
+            conn.execute(text(f"DELETE FROM {table} WHERE match_id = :m"), {'m': match_id})
+        conn.execute(text("UPDATE ingest_state SET checksum = 'stale'"))
+
+    def counts():
+        with engine.connect() as conn:
+            return [conn.execute(text(f"SELECT count(*) FROM {t}")).scalar()
+                    for t in ['matches', 'batting_cards', 'bowling_cards']]
+
+    load_data(engine=engine, incremental=True)
+    first = counts()
+    stats = load_data(engine=engine, incremental=True)
+    assert counts() == first
+    assert all(s['rows'] == 0 for s in stats.values())
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM matches WHERE match_id = :m"), {'m': match_id}).scalar() == 1
+
+def test_incremental_ingest_restores_older_match():
+    from src.etl.ingest import load_data
+    engine = create_engine("sqlite://")
+    load_data(engine=engine)
+    tables = ['matches', 'batting_cards', 'bowling_cards']
+
+    def counts(match_id):
+        with engine.connect() as conn:
+            return [conn.execute(text(f"SELECT count(*) FROM {t} WHERE match_id = :m"), {'m': match_id}).scalar()
+                    for t in tables]
+
+    with engine.connect() as conn:
+        match_id = conn.execute(text("SELECT match_id FROM matches ORDER BY match_date DESC LIMIT 1 OFFSET 5")).scalar()
+    before = counts(match_id)
+    with engine.begin() as conn:
+        for table in tables:
+            conn.execute(text(f"DELETE FROM {table} WHERE match_id = :m"), {'m': match_id})
+        conn.execute(text("UPDATE ingest_state SET checksum = 'stale'"))
+
+    load_data(engine=engine, incremental=True)
+    assert counts(match_id) == before and before[0] == 1
+
+def test_incremental_aggregates_match_full_build():
+    from src.etl.ingest import load_data
+    from src.etl.aggregates import refresh_aggregates
+    engine = create_engine("sqlite://")
+    load_data(engine=engine)
+
+    def aggregates():
+        with engine.connect() as conn:
+            return {table: conn.execute(text(f"SELECT * FROM {table} ORDER BY {order}")).fetchall()
+                    for table, order in [('leaderboards', 'season, category, rank'),
+                                         ('partnership_pair_stats', 'player_a, player_b'),
+                                         ('team_wicket_stats', 'team, wicket')]}
+
+    expected = aggregates()
+    with engine.begin() as conn:
+        match_id = conn.execute(text("SELECT match_id FROM matches ORDER BY match_date DESC LIMIT 1")).scalar()
+        for table in ['batting_cards', 'bowling_cards', 'partnerships', 'fall_of_wickets', 'matches']:
+            conn.execute(text(f"DELETE FROM {table} WHERE match_id = :m"), {'m': match_id})
+        refresh_aggregates(conn)
+        conn.execute(text("UPDATE ingest_state SET checksum = 'stale'"))
+    stale = aggregates()
+    assert all(stale[table] != expected[table] for table in expected)
+
+    load_data(engine=engine, incremental=True)
+    assert aggregates() == expected
+
+def test_parallel_pipeline_matches_sequential_load(tmp_path):
+    from src.etl.pipeline import load_data_parallel
+    engine = create_engine(f"sqlite:///{tmp_path / 'ipl.db'}")
+    # Small split size forces the batting/bowling files into several parse tasks
+    stats = load_data_parallel(engine=engine, workers=2, split_bytes=256 * 1024)
+    with engine.connect() as conn:
+        batting = conn.execute(text("SELECT count(*) FROM batting_cards")).scalar()
+        players = conn.execute(text("SELECT count(*) FROM players")).scalar()
+    assert batting == stats['batting_cards']['rows'] == 22497
+    assert players == stats['players']['rows']
+
+def test_career_stats_match_batting_cards():
+    from src.etl.schema import get_engine
+    engine = get_engine()
+    with engine.connect() as conn:
+        player_id, runs = conn.execute(text(
+            "SELECT player_id, runs FROM player_career_stats ORDER BY runs DESC LIMIT 1")).first()
+        raw_runs = conn.execute(text(
+            "SELECT sum(runs) FROM batting_cards WHERE player_id = :p"), {'p': player_id}).scalar()
+    assert runs == raw_runs
+
+def test_engine_is_shared_and_tuned():
+    from src.etl.schema import get_engine
+    engine = get_engine()
+    assert get_engine() is engine
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == 'wal'
+        indexes = {row[1] for row in conn.exec_driver_sql("PRAGMA index_list('batting_cards')")}
+    assert 'ix_batting_cards_player_match' in indexes
+
+def test_matchup_store_matches_groupby(tmp_path):
+    import numpy as np
+    import pandas as pd
+    from sqlalchemy import insert
+    from src.etl.schema import create_schema, BallByBall
+    from src.etl.matchups import MatchupStore
+
+    rng = np.random.default_rng(0)
+    n = 5000
+    runs = rng.choice([0, 1, 2, 4, 6], n)
+    wicket = rng.random(n) < 0.05
+    balls = pd.DataFrame({
+        'match_id': rng.integers(1, 5, n), 'batsman_id': rng.integers(1, 20, n), 'bowler_id': rng.integers(100, 110, n),
+        'batsman_runs': runs, 'total_runs': runs, 'is_four': runs == 4, 'is_six': runs == 6, 'is_wicket': wicket,
+        'dismissal_kind': np.where(wicket & (rng.random(n) < 0.2), 'run out', None),
+    })
+    engine = create_engine("sqlite://")
+    create_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(BallByBall.__table__), balls.to_dict('records'))
+        store = MatchupStore.build(conn, version=3, chunk_size=1000)
+    path = store.save(str(tmp_path))
+    assert os.stat(path).st_mode & 0o777 == 0o755
+    store = MatchupStore.load(path)
+
+    pair = balls[(balls['batsman_id'] == 5) & (balls['bowler_id'] == 103)]
+    assert store.head_to_head(5, 103) == {
+        'balls': len(pair), 'runs': int(pair['batsman_runs'].sum()),
+        'dismissals': int((pair['is_wicket'] & pair['dismissal_kind'].isna()).sum()),
+        'dots': int((pair['total_runs'] == 0).sum()), 'fours': int(pair['is_four'].sum()),
+        'sixes': int(pair['is_six'].sum()),
+    }
+    assert store.head_to_head(5, 999)['balls'] == 0
+    worst = store.worst_bowlers(5, limit=3)
+    assert [w['dismissals'] for w in worst] == sorted((w['dismissals'] for w in worst), reverse=True)
+    victims = store.best_victims(103, limit=50)
+    assert sum(v['balls'] for v in victims) == int((balls['bowler_id'] == 103).sum())
+    assert store.head_to_head(victims[0]['player_id'], 103)['dismissals'] == victims[0]['dismissals']
+
+def test_columnar_ball_store(tmp_path):
+    import numpy as np
+    import pandas as pd
+    from sqlalchemy import insert
+    from src.etl.schema import create_schema, BallByBall
+    from src.etl.columnar import BallStore
+    from src.etl.matchups import MatchupStore
+
+    rng = np.random.default_rng(1)
+    n = 3000
+    wicket = rng.random(n) < 0.05
+    balls = pd.DataFrame({
+        'match_id': rng.integers(1, 6, n), 'innings_no': rng.integers(1, 3, n), 'over_number': rng.integers(1, 21, n),
+        'ball_number': rng.integers(1, 7, n), 'batsman_id': rng.integers(1, 20, n), 'bowler_id': rng.integers(100, 110, n),
+        'batsman_runs': rng.choice([0, 1, 4, 6], n), 'total_runs': rng.choice([0, 1, 4, 6], n),
+        'is_four': False, 'is_six': False, 'is_wicket': wicket,
+        'dismissal_kind': np.where(wicket & (rng.random(n) < 0.3), 'run out', None),
+    })
+    engine = create_engine("sqlite://")
+    create_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(BallByBall.__table__), balls.to_dict('records'))
+        store = BallStore.open(BallStore.write(conn, str(tmp_path), version=2, chunk_size=700))
+        from_sql = MatchupStore.build(conn, version=2)
+    from_columns = MatchupStore.build(None, version=2, chunk_size=700, columns=store)
+
+    assert len(store) == n and isinstance(store['match_id'], np.memmap)
+    match = store.match(3, ['innings_no', 'batsman_runs'])
+    expected = balls[balls['match_id'] == 3]
+    assert len(match['innings_no']) == len(expected)
+    assert int(match['batsman_runs'].sum()) == int(expected['batsman_runs'].sum())
+    assert list(match['innings_no']) == sorted(match['innings_no'])
+    assert len(store.match(99)['match_id']) == 0
+    assert (np.asarray(from_columns.keys) == np.asarray(from_sql.keys)).all()
+    assert (np.asarray(from_columns.stats) == np.asarray(from_sql.stats)).all()
+
+def test_synthetic_scaler_keeps_matches_whole(tmp_path):
+    import pandas as pd
+    from benchmarks.synthetic import scale_raw
+    from src.etl.ingest import RAW_PATH, SOURCES
+    rows = scale_raw(3, tmp_path)
+    matches = pd.read_csv(tmp_path / SOURCES['matches'])
+    batting = pd.read_csv(tmp_path / SOURCES['batting'])
+    original = pd.read_csv(os.path.join(RAW_PATH, SOURCES['matches']))
+
+    assert rows['matches'] == 3 * len(original) and matches['match_id'].is_unique
+    assert set(batting['match_id']) <= set(matches['match_id'])
+    # Each season keeps its size; every copy is a resample of the real matches
+    assert (matches['season'].value_counts() == 3 * original['season'].value_counts()).all()
+    assert set(original['match_id']) <= set(matches['match_id'])
+
+def test_parallel_pipeline_fails_fast_when_writer_dies(tmp_path, monkeypatch):
+    import threading
+    from src.etl import pipeline
+    from src.etl.ingest import SourceWriter
+    original = SourceWriter.write
+
+    def failing_write(self, df):
+        if self.source == 'batting':
+            raise ValueError("disk full")
+        return original(self, df)
+    monkeypatch.setattr(SourceWriter, 'write', failing_write)
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'ipl.db'}")
+    outcome = []
+
+    def run():
+        try:
+            pipeline.load_data_parallel(engine=engine, workers=2, split_bytes=64 * 1024, queue_size=2)
+        except Exception as e:
+            outcome.append(e)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=120)
+    assert not thread.is_alive(), "pipeline hung after the writer failed"
+    assert isinstance(outcome[0], RuntimeError) and "disk full" in str(outcome[0])
@@ -0,0 +1,199 @@
+import pytest
+from src.ml.predict import Predictor
+
+SCENARIO = dict(season=2023, venue="Eden Gardens", team="KKR", opposition="RCB",
+                toss_winner="RCB", toss_choice="bowl", innings=2)
+
+def test_fast_path_matches_batch():
+    predictor = Predictor()
+    single = predictor.predict(**SCENARIO)
+    batch = predictor.predict_batch([SCENARIO, dict(SCENARIO, innings=1)])
+    assert abs(single - float(batch[0])) < 1e-3
+    assert len(batch) == 2
+
+def test_encoders_are_saved_lookups():
+    predictor = Predictor()
+    predictor.load_model()
+    assert predictor._encode('team', 'KKR') == predictor.encoders['team']['KKR']
+    assert predictor._encode('team', 'Not A Team') != predictor._encode('team', 'Not A Team')  # NaN
+
+def test_registry_promotion_swaps_model(tmp_path):
+    from src.ml.registry import ModelRegistry
+    live = ModelRegistry()
+    loaded = live.load()
+    registry = ModelRegistry(str(tmp_path))
+    first = registry.register(loaded.booster, loaded.encoders, loaded.features, {'mae': 1.0}, 1)
+    predictor = Predictor(str(tmp_path))
+    registry.promote(first)
+    assert predictor.load_model().version == first
+    before = predictor.current
+
+    encoders = {col: dict(codes) for col, codes in loaded.encoders.items()}
+    encoders['team']['KKR'] = encoders['team']['RCB']
+    second = registry.register(loaded.booster, encoders, loaded.features, {'mae': 1.0}, 2)
+    assert not predictor.refresh_model()
+    registry.promote(second)
+    assert predictor.refresh_model()
+    assert predictor.model_version == second
+    # A request holding the old snapshot still completes against it
+    assert before.version == first and predictor.predict(**SCENARIO, model=before) > 0
+    assert predictor._encode('team', 'KKR') == loaded.encoders['team']['RCB']
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['ACTIVE', first, second]
+
+    # A register that died before its rename leaves a staging dir behind
+    (tmp_path / ".v0003-abc").mkdir()
+    (tmp_path / ".v0003-abc" / "meta.json").write_text("{}")
+    assert registry.versions() == [first, second]
+    with pytest.raises(ValueError):
+        registry.promote(".v0003-abc")
+
+def test_feature_store_incremental_matches_full_replay():
+    from sqlalchemy import create_engine, text
+    from src.etl.ingest import load_data
+    from src.ml.feature_store import FeatureStore
+    from src.ml.features import load_training_data
+
+    engine = create_engine("sqlite://")
+    load_data(engine=engine)
+    with engine.begin() as conn:
+        match_id = conn.execute(text("SELECT match_id FROM matches ORDER BY match_date DESC LIMIT 1")).scalar()
+        conn.execute(text("DELETE FROM matches WHERE match_id = :m"), {'m': match_id})
+        conn.execute(text("UPDATE ingest_state SET checksum = 'stale'"))
+    load_data(engine=engine, incremental=True)
+
+    with engine.connect() as conn:
+        stored = FeatureStore.load(conn)
+    replayed = FeatureStore.from_history(load_training_data(engine))
+    assert stored.overall.count == replayed.overall.count
+    for team in replayed.teams:
+        assert stored.features(team, None) == replayed.features(team, None)
+
+def test_feature_store_rebuilds_after_backfilling_an_older_match():
+    from sqlalchemy import create_engine, text
+    from src.etl.ingest import load_data
+    from src.ml.feature_store import FeatureStore, update_feature_store
+    from src.ml.features import load_training_data
+
+    engine = create_engine("sqlite://")
+    load_data(engine=engine)
+    with engine.begin() as conn:
+        match_id = conn.execute(text("SELECT match_id FROM matches ORDER BY match_date DESC LIMIT 1 OFFSET 200")).scalar()
+        for table in ['matches', 'batting_cards', 'bowling_cards']:
+            conn.execute(text(f"DELETE FROM {table} WHERE match_id = :m"), {'m': match_id})
+        # The store as an earlier ingest without this match would have left it
+        update_feature_store(conn, rebuild=True)
+        conn.execute(text("UPDATE ingest_state SET checksum = 'stale'"))
+    load_data(engine=engine, incremental=True)
+
+    with engine.connect() as conn:
+        stored = FeatureStore.load(conn)
+    replayed = FeatureStore.from_history(load_training_data(engine))
+    assert (stored.overall.count, stored.overall.runs_sum) == (replayed.overall.count, replayed.overall.runs_sum)
+    for team in replayed.teams:
+        assert stored.features(team, None) == replayed.features(team, None)
+
+def test_vectorized_rolling_features_match_lambda_version():
+    from src.ml.features import load_training_data, calculate_rolling_features
+    data = load_training_data()
+    expected = data.copy()
+    expected['team_avg_runs_5'] = expected.groupby('team')['runs'].transform(lambda x: x.shift(1).rolling(window=5, min_periods=1).mean())
+    expected['team_avg_runs_all'] = expected.groupby('team')['runs'].transform(lambda x: x.shift(1).expanding().mean())
+    expected['venue_avg_runs'] = expected.groupby('venue')['runs'].transform(lambda x: x.shift(1).expanding().mean())
+    expected.fillna(expected['runs'].mean(), inplace=True)
+
+    result = calculate_rolling_features(data.copy())
+    cols = ['team_avg_runs_5', 'team_avg_runs_all', 'venue_avg_runs']
+    assert (result[cols] == expected[cols]).all().all()
+
+def test_prior_mean_skips_missing_values():
+    import numpy as np
+    import pandas as pd
+    from src.ml.features import prior_mean
+    data = pd.DataFrame({'team': ['A', 'B', 'A', 'A', 'B', 'A', 'B', 'A'],
+                         'runs': [150, np.nan, np.nan, 170, 160, np.nan, 180, 190]})
+    for window in [2, None]:
+        rolling = lambda x: (x.shift(1).expanding() if window is None else x.shift(1).rolling(window, min_periods=1)).mean()
+        expected = data.groupby('team')['runs'].transform(rolling)
+        pd.testing.assert_series_equal(prior_mean(data, 'team', 'runs', window), expected, check_names=False)
+
+def test_season_folds_never_train_on_the_future():
+    from src.ml.features import load_training_data, calculate_rolling_features, fit_encoders
+    from src.ml.tuning import season_folds, evaluate
+    data = calculate_rolling_features(load_training_data())
+    folds = season_folds(data, fit_encoders(data), min_train_seasons=12)
+    season_col = 0 # 'season' is the first feature
+    for fold in folds:
+        assert fold['X_fit'][:, season_col].max() < fold['X_stop'][:, season_col].min()
+        assert fold['X_stop'][:, season_col].max() < fold['season']
+    result = evaluate({'max_depth': 3, 'learning_rate': 0.1}, folds[:1], threads=1)
+    assert result['mae'] > 0 and result['n_estimators'] >= 1
+
+def test_simulation_learns_side_strength():
+    import numpy as np
+    from sqlalchemy import create_engine, insert
+    from src.etl.schema import create_schema, BallByBall, Match
+    from src.ml.simulate import OutcomeModel, outcome_counts, simulate_match
+
+    rng = np.random.default_rng(0)
+    engine = create_engine("sqlite://")
+    create_schema(engine)
+    balls = []
+    for match_id in range(1, 21):
+        for innings, strong in [(1, True), (2, False)]:
+            runs = rng.choice([0, 1, 4, 6], 120, p=[0.3, 0.4, 0.2, 0.1] if strong else [0.5, 0.4, 0.08, 0.02])
+            wickets = rng.random(120) < 0.04
+            balls += [dict(match_id=match_id, innings_no=innings, over_number=i // 6 + 1, ball_number=i % 6 + 1,
+                           total_runs=int(r), batsman_runs=int(r), is_wicket=bool(w))
+                      for i, (r, w) in enumerate(zip(runs, wickets))]
+    with engine.begin() as conn:
+        conn.execute(insert(Match.__table__), [dict(match_id=m, team1_name="MI", team2_name="CSK", venue_stadium="Wankhede")
+                                               for m in range(1, 21)])
+        conn.execute(insert(BallByBall.__table__), balls)
+        model = OutcomeModel.fit(outcome_counts(conn))
+
+    assert model.balls == len(balls)
+    probs = model.probabilities("MI", "CSK", "Wankhede")
+    assert np.allclose(probs.sum(axis=1), 1)
+    result = simulate_match(model, "MI", "CSK", "Wankhede", n=2000, seed=7)
+    assert result == simulate_match(model, "MI", "CSK", "Wankhede", n=2000, seed=7)
+    assert result["first_innings"]["mean"] > result["second_innings"]["mean"]
+    assert result["win_probability"] > 0.5
+    assert result["first_innings"]["mean_wickets"] <= 10
+    chase = simulate_match(model, "CSK", "MI", "Wankhede", n=2000, target=400, seed=7)
+    assert chase["win_probability"] == 0 and "second_innings" not in chase
+
+def test_simulation_from_synthetic_counts():
+    import pandas as pd
+    from src.ml.simulate import OutcomeModel, FIRST_OVER, OVERS, WICKET, simulate_match
+    # Death overs score more; no row for the first over, so a guess from the
+    # smallest over seen would shift every over by one
+    rows = []
+    for over in range(FIRST_OVER + 1, FIRST_OVER + OVERS):
+        death = over >= FIRST_OVER + 15
+        for side, bowling in [("MI", "CSK"), ("CSK", "MI")]:
+            for outcome, n in [(0, 40), (1, 50), (4, 30 if death else 10), (6, 20 if death else 4), (WICKET, 5)]:
+                rows.append((over, "Wankhede", side, bowling, outcome, n * (2 if side == "MI" else 1)))
+    counts = pd.DataFrame(rows, columns=['over', 'venue', 'batting', 'bowling', 'outcome', 'n'])
+    model = OutcomeModel.fit(counts)
+
+    probs = model.probabilities("MI", "CSK", "Wankhede")
+    assert probs[15:, 6].min() > probs[1:15, 6].max() # outcome 6 = a six
+    result = simulate_match(model, "MI", "CSK", "Wankhede", n=3000, seed=11)
+    assert result == simulate_match(model, "MI", "CSK", "Wankhede", n=3000, seed=11)
+    for innings in ["first_innings", "second_innings"]:
+        quantiles = list(result[innings]["quantiles"].values())
+        assert quantiles == sorted(quantiles) and 0 <= result[innings]["mean_wickets"] <= 10
+    assert 0 <= result["win_probability"] <= 1
+
+def test_feature_store_loads_once_per_data_version(monkeypatch):
+    from src.ml import predict
+    loads = []
+    original = predict.FeatureStore.load
+    monkeypatch.setattr(predict.FeatureStore, 'load', lambda conn: loads.append(1) or original(conn))
+    predictor = Predictor()
+    predictor.sync_features(3)
+    predictor.load_model()
+    predictor.sync_features(3)
+    assert len(loads) == 1
+    predictor.sync_features(4)
+    assert len(loads) == 2